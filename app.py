@@ -6,15 +6,30 @@ from datetime import datetime, timedelta
 from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions, generate_container_sas, ContainerSasPermissions
 from azure.ai.translation.document import DocumentTranslationClient, DocumentTranslationInput, TranslationTarget
 from azure.core.credentials import AzureKeyCredential
+from azure.core.pipeline.transport import RequestsTransport
 import urllib.parse
 import requests
 import fitz # PyMuPDF for page count
 import pandas as pd
+import pyarrow as pa # Columnar tables for st.dataframe (ships with Streamlit)
 import zipfile
 import io
+import re
+import tempfile
+import json
+import hashlib
+import base64
+import mimetypes
+import unicodedata
+import random
+import heapq
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
+from functools import partial
+from operator import itemgetter
 
 # Search Manager Import
-from search_manager import AzureSearchManager
+from search_manager import AzureSearchManager, odata_prefix_filter
 
 # Chat Manager Import  
 from chat_manager_v2 import AzureOpenAIChatManager
@@ -25,6 +40,7 @@ import excel_manager
 from utils.auth_manager import AuthManager
 from modules.login_page import render_login_page
 from utils.chat_history_utils import load_history, save_history, get_session_title
+from utils.text_utils import nfc
 import extra_streamlit_components as stx
 
 # -----------------------------
@@ -115,6 +131,8 @@ def get_secret(key):
 # 1. Storage
 STORAGE_CONN_STR = get_secret("AZURE_STORAGE_CONNECTION_STRING")
 CONTAINER_NAME = get_secret("AZURE_BLOB_CONTAINER_NAME") or "blob-leesunguk"
+# SAS 서명에 Azure AD user delegation key 사용 여부 (Storage Blob Delegator 역할 필요)
+STORAGE_USE_AAD_SAS = str(get_secret("AZURE_STORAGE_USE_AAD_SAS") or "").lower() in ("1", "true", "yes")
 
 # 2. Translator
 TRANSLATOR_KEY = get_secret("AZURE_TRANSLATOR_KEY")
@@ -140,11 +158,75 @@ AZURE_DOC_INTEL_KEY = get_secret("AZURE_DOC_INTEL_KEY")
 # -----------------------------
 # Azure 클라이언트 헬퍼
 # -----------------------------
+@st.cache_resource(show_spinner=False)
+def get_shared_transport():
+    """
+    One requests session (keep-alive connection pool) shared by every Azure SDK client in the app.
+    session_owner=False keeps a client's close() from tearing the session down for the others.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=32)
+    session.mount("https://", adapter)
+    return RequestsTransport(session=session, session_owner=False)
+
+@st.cache_resource(show_spinner=False)
+def get_background_executor():
+    """Process-wide worker pool for fire-and-forget admin requests (the script thread only polls the futures)."""
+    return ThreadPoolExecutor(max_workers=4)
+
+@st.cache_resource(show_spinner=False)
+def _shared_blob_service_client(conn_str):
+    # One client per process, shared by every session and rerun
+    return BlobServiceClient.from_connection_string(conn_str, transport=get_shared_transport())
+
 def get_blob_service_client():
     if not STORAGE_CONN_STR:
         st.error("Azure Storage Connection String이 설정되지 않았습니다.")
         st.stop()
-    return BlobServiceClient.from_connection_string(STORAGE_CONN_STR)
+    return _shared_blob_service_client(STORAGE_CONN_STR)
+
+@st.cache_resource(show_spinner=False)
+def _shared_container_client(conn_str, container_name):
+    return _shared_blob_service_client(conn_str).get_container_client(container_name)
+
+def get_container_client():
+    """ContainerClient for CONTAINER_NAME, built once and shared (same transport as the BlobServiceClient)."""
+    get_blob_service_client()  # connection string check
+    return _shared_container_client(STORAGE_CONN_STR, CONTAINER_NAME)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _get_user_delegation_key(account_name, hour_bucket):
+    """
+    Fetches a user delegation key once per hour bucket and reuses it for every SAS signed in that hour.
+    The key stays valid for one extra hour so SAS tokens issued late in the bucket don't outlive it.
+    Returns None if no Azure AD identity is available.
+    """
+    try:
+        from azure.identity import DefaultAzureCredential
+        aad_client = BlobServiceClient(f"https://{account_name}.blob.core.windows.net", credential=DefaultAzureCredential())
+        bucket_start = datetime.strptime(hour_bucket, "%Y%m%d%H")
+        return aad_client.get_user_delegation_key(
+            key_start_time=bucket_start - timedelta(minutes=15),
+            key_expiry_time=bucket_start + timedelta(hours=2, minutes=15)
+        )
+    except Exception as e:
+        print(f"DEBUG: User delegation key unavailable, falling back to account key: {e}")
+        return None
+
+def get_sas_credential(blob_service_client):
+    """
+    Returns the signing kwargs for generate_blob_sas / generate_container_sas:
+    a cached user delegation key when enabled, otherwise the account key.
+    """
+    if STORAGE_USE_AAD_SAS:
+        udk = _get_user_delegation_key(blob_service_client.account_name, datetime.utcnow().strftime("%Y%m%d%H"))
+        if udk is not None:
+            return {"user_delegation_key": udk}
+    
+    # Handle credential types
+    if hasattr(blob_service_client.credential, 'account_key'):
+        return {"account_key": blob_service_client.credential.account_key}
+    return {"account_key": blob_service_client.credential['account_key']}
 
 def get_translation_client():
     if not TRANSLATOR_KEY or not TRANSLATOR_ENDPOINT:
@@ -152,31 +234,158 @@ def get_translation_client():
         st.stop()
     return DocumentTranslationClient(TRANSLATOR_ENDPOINT, AzureKeyCredential(TRANSLATOR_KEY))
 
+@st.cache_resource(show_spinner=False)
+def _shared_search_manager(endpoint, key, index_name):
+    return AzureSearchManager(endpoint, key, index_name, transport=get_shared_transport())
+
 def get_search_manager():
     if not SEARCH_ENDPOINT or not SEARCH_KEY:
         st.error("Azure Search Endpoint 또는 Key가 설정되지 않았습니다.")
         st.stop()
-    return AzureSearchManager(SEARCH_ENDPOINT, SEARCH_KEY, SEARCH_INDEX_NAME)
+    return _shared_search_manager(SEARCH_ENDPOINT, SEARCH_KEY, SEARCH_INDEX_NAME)
+
+@st.cache_resource(show_spinner=False)
+def _shared_chat_manager(endpoint, key, deployment, api_version, storage_conn_str, container_name, _search_manager):
+    # One manager per process, so its answer/rewrite/filename caches and SAS memo survive reruns and are
+    # shared across sessions (answer cache keys include user_folder and is_admin)
+    return AzureOpenAIChatManager(endpoint, key, deployment, api_version, _search_manager, storage_conn_str, container_name)
 
 def get_chat_manager():
     if not AZURE_OPENAI_ENDPOINT or not AZURE_OPENAI_KEY:
         st.error("Azure OpenAI Endpoint 또는 Key가 설정되지 않았습니다.")
         st.stop()
-    return AzureOpenAIChatManager(
+    return _shared_chat_manager(
         AZURE_OPENAI_ENDPOINT, 
         AZURE_OPENAI_KEY, 
         AZURE_OPENAI_DEPLOYMENT, 
         AZURE_OPENAI_API_VERSION,
-        get_search_manager(),
         STORAGE_CONN_STR,
-        CONTAINER_NAME
+        CONTAINER_NAME,
+        get_search_manager()
     )
 
+@st.cache_resource(show_spinner=False)
+def _shared_doc_intel_manager(endpoint, key):
+    return DocumentIntelligenceManager(endpoint, key)
+
 def get_doc_intel_manager():
     if not AZURE_DOC_INTEL_ENDPOINT or not AZURE_DOC_INTEL_KEY:
         st.error("Azure Document Intelligence Endpoint 또는 Key가 설정되지 않았습니다.")
         st.stop()
-    return DocumentIntelligenceManager(AZURE_DOC_INTEL_ENDPOINT, AZURE_DOC_INTEL_KEY)
+    return _shared_doc_intel_manager(AZURE_DOC_INTEL_ENDPOINT, AZURE_DOC_INTEL_KEY)
+
+# Content types for the file types stored in the container (avoids mimetypes table lookups per result)
+_EXT_CONTENT_TYPES = {
+    '.pdf': 'application/pdf',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.tif': 'image/tiff',
+    '.tiff': 'image/tiff',
+    '.bmp': 'image/bmp',
+    '.txt': 'text/plain',
+    '.doc': 'application/msword',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.xls': 'application/vnd.ms-excel',
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    '.ppt': 'application/vnd.ms-powerpoint',
+    '.pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+}
+
+def guess_content_type(name):
+    """Content type from the file extension; falls back to mimetypes for uncommon types."""
+    _, dot, ext = name.rpartition('.')
+    if dot:
+        content_type = _EXT_CONTENT_TYPES.get('.' + ext.lower())
+        if content_type:
+            return content_type
+    return mimetypes.guess_type(name)[0]
+
+def _mask_secret(value):
+    """Masked display form of a secret (Secret Inspector)."""
+    if not value: return "Not Set"
+    if len(value) <= 8: return "*" * len(value)
+    return value[:4] + "*" * (len(value)-8) + value[-4:]
+
+# Shared read-only SAS permission (avoids rebuilding it for every signature)
+READ_PERMISSION = BlobSasPermissions(read=True)
+
+CONTAINER_PATH_TOKEN = f"/{CONTAINER_NAME}/"
+DIRECT_FETCH_PREFIX = "https://direct_fetch/"
+
+# URL-encodes a blob name for a blob URL (path separators kept); only used where the final URL is built
+quote_blob_path = partial(urllib.parse.quote, safe='/')
+
+def blob_path_from_url(path):
+    """
+    Extracts the decoded blob name from an index metadata_storage_path (blob URL or direct_fetch scheme).
+    Paths that are neither are returned unchanged.
+    """
+    if path.startswith(DIRECT_FETCH_PREFIX):
+        encoded_path = path[len(DIRECT_FETCH_PREFIX):]
+    else:
+        _, sep, encoded_path = path.partition(CONTAINER_PATH_TOKEN)
+        if not sep:
+            return path
+    return urllib.parse.unquote(encoded_path.partition('#')[0])
+
+# Page suffixes appended to names/paths by the indexer (" (p.3)") and by LLM citations (" (p. 3)", "(p3)")
+_PAGE_SUFFIX_RE = re.compile(r'\s*\(p\.\d+\)$')
+_CITATION_PAGE_SUFFIX_RE = re.compile(r'\s*\(\s*p\.?\s*\d+\s*\)')
+
+def result_blob_path(res_path):
+    """Blob name for a search result path, without a trailing " (p.N)" page suffix."""
+    return _PAGE_SUFFIX_RE.sub('', blob_path_from_url(res_path))
+
+def make_page_doc_id(blob_path, page_number):
+    """
+    Index key for one page of a blob: fixed 32 hex chars regardless of path length.
+    The same path + page always maps to the same key, so re-uploads overwrite in place.
+    """
+    return hashlib.blake2b(f"{blob_path}|{page_number}".encode('utf-8'), digest_size=16).hexdigest()
+
+def build_page_document(page_chunk, blob_path, filename, account_name, size, content_type, indexed_at):
+    """Index document for one analyzed drawing page (shared by upload and re-analysis)."""
+    page_number = page_chunk['page_number']
+    content = page_chunk['content']
+    return {
+        "id": make_page_doc_id(blob_path, page_number),
+        "content": content,
+        "content_exact": content,
+        "metadata_storage_name": f"{filename} (p.{page_number})",
+        "metadata_storage_path": f"https://{account_name}.blob.core.windows.net/{CONTAINER_NAME}/{blob_path}#page={page_number}",
+        "metadata_storage_last_modified": indexed_at,
+        "metadata_storage_size": size,
+        "metadata_storage_content_type": content_type,
+        "project": "drawings_analysis",  # Tag for filtering
+        "title": page_chunk.get('도면명(TITLE)', ''),  # Drawing title
+        "drawing_no": page_chunk.get('도면번호(DWG. NO.)', ''),  # Drawing number
+        "page_number": page_number,  # Page number for filtering
+        "filename": filename  # Filename for search
+    }
+
+def legacy_page_doc_id(blob_path, page_number):
+    """Previous key format (base64 of path + page), used to clean up pages indexed before make_page_doc_id."""
+    return base64.urlsafe_b64encode(f"{blob_path}_page_{page_number}".encode('utf-8')).decode('utf-8')
+
+def delete_stale_page_docs(search_manager, blob_path, page_chunks):
+    """
+    Removes index copies of re-indexed pages that sit under another key: pre-blake2b ids and
+    pages renamed in place by older versions (which kept the id of their original blob path).
+    Missing keys are a no-op for the index.
+    """
+    fresh_ids = {make_page_doc_id(blob_path, c['page_number']) for c in page_chunks}
+    stale_ids = [{"id": legacy_page_doc_id(blob_path, c['page_number'])} for c in page_chunks]
+    try:
+        filename = nfc(blob_path.rsplit('/', 1)[-1])
+        stale_ids += [
+            {"id": doc['id']}
+            for doc in search_manager.find_drawing_pages(filename, select=["id", "metadata_storage_path"])
+            if doc['id'] not in fresh_ids and blob_path_from_url(doc.get('metadata_storage_path') or '') == blob_path
+        ]
+        search_manager.index_in_batches("delete_documents", stale_ids)
+    except Exception as e:
+        print(f"DEBUG: Stale doc cleanup failed for {blob_path}: {e}")
 
 def generate_sas_url(blob_service_client, container_name, blob_name=None, page=None, permission="r", expiry_hours=1, content_disposition=None):
     """
@@ -185,24 +394,17 @@ def generate_sas_url(blob_service_client, container_name, blob_name=None, page=N
     """
     try:
         account_name = blob_service_client.account_name
-        
-        # Handle credential types
-        if hasattr(blob_service_client.credential, 'account_key'):
-            account_key = blob_service_client.credential.account_key
-        else:
-            account_key = blob_service_client.credential['account_key']
+        sas_credential = get_sas_credential(blob_service_client)
         
         start = datetime.utcnow() - timedelta(minutes=15)
         expiry = datetime.utcnow() + timedelta(hours=expiry_hours)
         
         if blob_name:
             # Clean blob name (remove page suffixes like " (p.1)")
-            import re
-            clean_name = re.sub(r'\s*\(\s*p\.?\s*\d+\s*\)', '', blob_name).strip()
+            clean_name = _CITATION_PAGE_SUFFIX_RE.sub('', blob_name).strip()
             
             # Determine content type
-            import mimetypes
-            content_type, _ = mimetypes.guess_type(clean_name)
+            content_type = guess_content_type(clean_name)
             
             # Force PDF content type if extension matches (to ensure browser opens it)
             if clean_name.lower().endswith('.pdf'):
@@ -218,14 +420,14 @@ def generate_sas_url(blob_service_client, container_name, blob_name=None, page=N
                 account_name=account_name,
                 container_name=container_name,
                 blob_name=clean_name,
-                account_key=account_key,
-                permission=BlobSasPermissions(read=True),
+                **sas_credential,
+                permission=READ_PERMISSION,
                 start=start,
                 expiry=expiry,
                 content_disposition=content_disposition,
                 content_type=content_type
             )
-            sas_url = f"https://{account_name}.blob.core.windows.net/{container_name}/{urllib.parse.quote(clean_name, safe='/')}?{sas_token}"
+            sas_url = f"https://{account_name}.blob.core.windows.net/{container_name}/{quote_blob_path(clean_name)}?{sas_token}"
             
             lower_name = clean_name.lower()
             if lower_name.endswith(('.pptx', '.ppt', '.docx', '.doc', '.xlsx', '.xls')):
@@ -248,7 +450,7 @@ def generate_sas_url(blob_service_client, container_name, blob_name=None, page=N
             sas_token = generate_container_sas(
                 account_name=account_name,
                 container_name=container_name,
-                account_key=account_key,
+                **sas_credential,
                 permission=ContainerSasPermissions(write=True, list=True, read=True, delete=True),
                 start=start,
                 expiry=expiry
@@ -259,11 +461,195 @@ def generate_sas_url(blob_service_client, container_name, blob_name=None, page=N
         st.error(f"SAS URL 생성 중 오류 발생 ({blob_name}): {e}")
         return "#"
 
+@st.cache_data(ttl=30, show_spinner=False)
+def list_user_blobs(prefixes):
+    """
+    Lists blobs under the given prefixes (newest first) as plain dicts with only the fields the file list shows.
+    Cached briefly so row clicks in the file archive don't re-list the container.
+    """
+    container_client = get_container_client()
+    seen = set()
+    blobs = []
+    for prefix in prefixes:
+        for blob in container_client.list_blobs(name_starts_with=prefix):
+            # 중복 제거 (혹시 모를 경우 대비)
+            if blob.name in seen:
+                continue
+            seen.add(blob.name)
+            blobs.append({
+                "full_name": blob.name,
+                "name": blob.name.split("/")[-1],
+                "folder": "/".join(blob.name.split("/")[:-1]),
+                "size": blob.size,
+                "creation_time": blob.creation_time
+            })
+    blobs.sort(key=lambda b: b["creation_time"], reverse=True)
+    return blobs
+
+@st.cache_data(ttl=30, show_spinner=False)
+def cached_index_search(search_text, filter_expr=None, select=(), top=50):
+    """
+    Read-only index query shared by the debug tools, cached briefly so repeated clicks reuse one request.
+    select is a tuple (hashable; a changed projection is a different cache entry). Returns a tuple of plain dicts.
+    """
+    results = get_search_manager().search_client.search(
+        search_text=search_text,
+        filter=filter_expr,
+        select=list(select) or None,
+        top=top
+    )
+    return tuple(dict(doc) for doc in results)
+
+@st.cache_data(ttl=30, show_spinner=False)
+def cached_index_count(filter_expr=None):
+    """Document count for a filter ($count with top=0), cached briefly like cached_index_search."""
+    return get_search_manager().search_client.search(
+        search_text="*",
+        filter=filter_expr,
+        include_total_count=True,
+        top=0
+    ).get_count()
+
+@st.cache_data(ttl=60, show_spinner=False)
+def cached_source_blob_count(container_name, folder_path=None):
+    """Source blob count for the indexing progress bar; the listing changes on a minute scale, not per refresh."""
+    return get_search_manager().get_source_blob_count(STORAGE_CONN_STR, container_name, folder_path=folder_path)
+
+@st.cache_data(ttl=10, show_spinner=False)
+def cached_document_count():
+    """Total index document count for the indexing monitor."""
+    return get_search_manager().get_document_count()
+
+@st.cache_data(ttl=5, show_spinner=False)
+def cached_indexer_status(folder_name):
+    """Last indexer run summary for the indexing monitor (shared across reruns for a few seconds)."""
+    return get_search_manager().get_indexer_status(folder_name)
+
+def clear_index_query_caches():
+    """Call after any index mutation from the debug tools."""
+    cached_index_search.clear()
+    cached_index_count.clear()
+
+def list_blob_names_under(container_client, subfolders):
+    """
+    Names of all blobs under "<subfolder>/" at the container root and inside every top-level (user) folder.
+    One delimiter listing finds the top-level folders; each subfolder prefix is then listed server-side, in parallel.
+    """
+    top_level = [item.name for item in container_client.walk_blobs(delimiter='/') if item.name.endswith('/')]
+    prefixes = [f"{folder}{sub}/" for sub in subfolders for folder in [""] + top_level]
+    
+    def list_prefix(prefix):
+        return [b.name for b in container_client.list_blobs(name_starts_with=prefix, results_per_page=5000) if not b.name.endswith('/')]
+    
+    with ThreadPoolExecutor(max_workers=min(8, len(prefixes))) as executor:
+        return list(chain.from_iterable(executor.map(list_prefix, prefixes)))
+
+def delete_blobs_bulk(container_client, blob_names, max_workers=8):
+    """
+    Deletes blobs with Blob Batch requests (up to 256 deletes per request), batches sent concurrently.
+    A batch the service rejects as a whole falls back to single deletes. Returns the number of blobs deleted.
+    """
+    batches = [blob_names[i:i + 256] for i in range(0, len(blob_names), 256)]
+    
+    def delete_batch(batch):
+        try:
+            responses = container_client.delete_blobs(*batch, raise_on_any_failure=False)
+            return sum(1 for response in responses if response.status_code == 202)
+        except Exception as e:
+            print(f"DEBUG: Blob batch delete unavailable ({e}); deleting {len(batch)} blobs one by one")
+            deleted = 0
+            for name in batch:
+                try:
+                    container_client.delete_blob(name)
+                    deleted += 1
+                except Exception as err:
+                    print(f"DEBUG: Failed to delete {name}: {err}")
+            return deleted
+    
+    if not batches:
+        return 0
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+        return sum(executor.map(delete_batch, batches))
+
+@st.cache_data(ttl=60, show_spinner=False)
+def list_drawing_blob_names(container_name):
+    """Every blob under a drawings/ folder (root and user folders), sorted by file name; cached for the Debug menu."""
+    container_client = get_blob_service_client().get_container_client(container_name)
+    return sorted(list_blob_names_under(container_client, ["drawings"]), key=lambda name: name.rsplit('/', 1)[-1])
+
+@st.cache_data(ttl=300, show_spinner=False)
+def list_top_level_folders(container_name):
+    """Top-level folder names of the container (one delimiter listing); cached for the admin folder selector."""
+    container_client = get_blob_service_client().get_container_client(container_name)
+    return [item.name.strip('/') for item in container_client.walk_blobs(delimiter='/', results_per_page=100) if item.name.endswith('/')]
+
+DRAWING_LIST_PAGE_SIZE = 200
+
+# Minimum time between redraws of a streamed chat answer
+STREAM_RENDER_INTERVAL_SECONDS = 0.25
+
+# (name, project, path) projection used by the index diagnostic dumps
+_diag_fields = itemgetter('metadata_storage_name', 'project', 'metadata_storage_path')
+
+@st.cache_data(ttl=30, show_spinner=False)
+def list_drawing_blobs(user_folder, user_role, limit=DRAWING_LIST_PAGE_SIZE):
+    """
+    Lists analyzed drawings for the user (plus root drawings/ for admins), most recently modified first,
+    returning the first `limit` of them. The whole folder listing is read (names and properties only,
+    both prefixes concurrently) so a newly uploaded file is in the window whatever its name.
+    Returns (blob_list, has_more). The result is cached briefly so tab switches don't re-list.
+    """
+    container_client = get_container_client()
+    prefixes = [f"{user_folder}/drawings/"]
+    if user_role == 'admin':
+        prefixes.append("drawings/")
+    
+    with ThreadPoolExecutor(max_workers=len(prefixes)) as executor:
+        listings = list(executor.map(
+            lambda prefix: list(container_client.list_blobs(name_starts_with=prefix, results_per_page=5000)),
+            prefixes
+        ))
+    
+    # Skip duplicates and folder markers
+    blobs = {blob.name: blob for listing in listings for blob in listing if not blob.name.endswith('/')}
+    recent = heapq.nlargest(limit, blobs.values(), key=lambda blob: blob.last_modified)
+    blob_list = [
+        {
+            'name': blob.name.split('/')[-1],
+            'full_name': blob.name,
+            'size': blob.size,
+            'size_mb': blob.size * 9.5367431640625e-7,  # 1 / (1024 * 1024), formatted once here instead of per render
+            'modified': blob.last_modified,
+            'etag': blob.etag
+        }
+        for blob in recent
+    ]
+    return blob_list, len(blobs) > limit
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _cached_sas_url(blob_name):
+    # SAS URLs are valid for 1h; reuse a signature for at most 10 minutes so a served link has >=50 minutes left
+    url = generate_sas_url(get_blob_service_client(), CONTAINER_NAME, blob_name)
+    if url == "#":
+        raise ValueError(f"SAS URL generation failed for {blob_name}")  # not cached
+    return url
+
+def get_citation_url(blob_name, page=None):
+    """
+    Viewer URL for a cited blob, with the SAS signature cached per blob (page anchors appended for PDFs).
+    Returns "#" if no URL can be generated.
+    """
+    try:
+        url = _cached_sas_url(blob_name)
+    except Exception:
+        return "#"
+    if page and urllib.parse.urlsplit(url).path.lower().endswith('.pdf'):
+        url += f"#page={page}"
+    return url
+
 # -----------------------------
 # Progress Management (Resume Capability)
 # -----------------------------
-import json
-
 TEMP_DIR = ".temp_analysis"
 if not os.path.exists(TEMP_DIR):
     os.makedirs(TEMP_DIR)
@@ -365,6 +751,81 @@ class LocalFile:
     def close(self):
         self._file.close()
 
+_LINEARIZATION_DICT = re.compile(rb'/Linearized\b(.*?)>>', re.S)
+_LINEARIZED_PAGE_COUNT = re.compile(rb'/N\s+(\d+)')
+_LINEARIZED_FILE_LENGTH = re.compile(rb'/L\s+(\d+)')
+
+def _blob_total_size(blob_client, range_download):
+    """
+    Full blob size for a ranged download: properties.size is only the range length,
+    the total is after the '/' of Content-Range ("bytes 0-1023/TOTAL").
+    """
+    content_range = range_download.properties.content_range or ""
+    total = content_range.rpartition('/')[2]
+    if total.isdigit():
+        return int(total)
+    return blob_client.get_blob_properties().size
+
+def get_blob_pdf_page_count(blob_client):
+    """
+    Page count of a PDF blob without holding the whole file in memory.
+    Linearized PDFs declare the count (/N) in their first object, so a 1KB range read is enough,
+    as long as the declared file length (/L) still equals the blob size (an incremental update
+    appends to the file and leaves /N stale); otherwise the blob is streamed to a temp file and
+    PyMuPDF opens it by path.
+    """
+    head_download = blob_client.download_blob(offset=0, length=1024)
+    head = head_download.readall()
+    linearization = _LINEARIZATION_DICT.search(head)
+    if linearization:
+        page_count = _LINEARIZED_PAGE_COUNT.search(linearization.group(1))
+        file_length = _LINEARIZED_FILE_LENGTH.search(linearization.group(1))
+        if page_count and file_length and int(file_length.group(1)) == _blob_total_size(blob_client, head_download):
+            return int(page_count.group(1))
+    
+    tmp = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+    try:
+        with tmp:
+            blob_client.download_blob(max_concurrency=4).readinto(tmp)
+        doc = fitz.open(tmp.name)
+        try:
+            return doc.page_count
+        finally:
+            doc.close()
+    finally:
+        os.remove(tmp.name)
+
+def analyze_range_with_retry(doc_intel_manager, blob_url, page_range, high_res=False, max_retries=3):
+    """
+    Analyzes one page range with Document Intelligence, retrying failed analyses.
+    HTTP-level throttling/5xx retries already happen inside the client's retry policy.
+    Safe to run in a worker thread (no Streamlit calls).
+    """
+    for retry in range(max_retries):
+        try:
+            return doc_intel_manager.analyze_document(blob_url, page_range=page_range, high_res=high_res)
+        except Exception as e:
+            if retry == max_retries - 1:
+                raise
+            # Exponential backoff with full jitter, so parallel chunks don't retry in lockstep
+            wait_time = random.uniform(0, 2 ** (retry + 2))
+            print(f"DEBUG: DI retry {retry+1}/{max_retries} for range {page_range} in {wait_time:.1f}s: {e}")
+            time.sleep(wait_time)
+
+def get_pdf_page_count(file):
+    """
+    Returns the page count of an uploaded/local PDF without copying it into a new bytes object.
+    Local files are opened by path; in-memory uploads are read through a zero-copy buffer view.
+    """
+    if isinstance(file, LocalFile):
+        doc = fitz.open(file.path)
+    else:
+        doc = fitz.open(stream=file.getbuffer(), filetype="pdf")
+    try:
+        return doc.page_count
+    finally:
+        doc.close()
+
 def is_drm_protected(uploaded_file):
     """
     Check if the uploaded file is DRM protected or encrypted.
@@ -656,7 +1117,7 @@ if menu == "번역하기":
                 with st.spinner("Azure Blob에 파일 업로드 중..."):
                     try:
                         blob_service_client = get_blob_service_client()
-                        container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+                        container_client = get_container_client()
                         
                         # 컨테이너 접근 권한 확인
                         try:
@@ -857,62 +1318,56 @@ elif menu == "파일 보관함":
         st.divider()
         
         if st.button("🔄 목록 새로고침"):
+            list_user_blobs.clear()
             st.rerun()
             
         try:
             blob_service_client = get_blob_service_client()
-            container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+            container_client = get_container_client()
             
             # 탭으로 Input/Output 구분
             tab1, tab2 = st.tabs(["원본 문서 (Input)", "번역된 문서 (Output)"])
             
             def render_file_list(prefixes, tab_name):
-                all_blobs = []
-                for prefix in prefixes:
-                    blobs = list(container_client.list_blobs(name_starts_with=prefix))
-                    all_blobs.extend(blobs)
-                
-                # 중복 제거 (혹시 모를 경우 대비)
-                unique_blobs = {b.name: b for b in all_blobs}.values()
-                blobs = list(unique_blobs)
-                blobs.sort(key=lambda x: x.creation_time, reverse=True)
+                blobs = list_user_blobs(tuple(prefixes))
                 
                 if not blobs:
                     st.info(f"{tab_name}에 파일이 없습니다.")
                     return
 
-                for i, blob in enumerate(blobs):
-                    file_name = blob.name.split("/")[-1]
-                    creation_time = blob.creation_time.strftime('%Y-%m-%d %H:%M')
+                for i, blob_info in enumerate(blobs):
+                    blob_name = blob_info["full_name"]
+                    file_name = blob_info["name"]
+                    creation_time = blob_info["creation_time"].strftime('%Y-%m-%d %H:%M')
                     
                     # 폴더 경로 표시 (관리자 편의)
-                    folder_path = "/".join(blob.name.split("/")[:-1])
+                    folder_path = blob_info["folder"]
                     
                     with st.container():
                         col1, col2, col3 = st.columns([6, 2, 2])
                         
                         with col1:
-                            sas_url = generate_sas_url(blob_service_client, CONTAINER_NAME, blob.name)
+                            sas_url = generate_sas_url(blob_service_client, CONTAINER_NAME, blob_name)
                             st.markdown(f"**[{file_name}]({sas_url})**")
-                            st.caption(f"📂 {folder_path} | 📅 {creation_time} | 📦 {blob.size / 1024:.1f} KB")
+                            st.caption(f"📂 {folder_path} | 📅 {creation_time} | 📦 {blob_info['size'] / 1024:.1f} KB")
                         
                         with col2:
                             # 수정 (이름 변경)
                             with st.popover("수정"):
-                                new_name = st.text_input("새 파일명", value=file_name, key=f"rename_{i}_{blob.name}")
-                                if st.button("이름 변경", key=f"btn_rename_{i}_{blob.name}"):
+                                new_name = st.text_input("새 파일명", value=file_name, key=f"rename_{i}_{blob_name}")
+                                if st.button("이름 변경", key=f"btn_rename_{i}_{blob_name}"):
                                     try:
                                         # 새 경로 생성 (기존 폴더 구조 유지)
-                                        path_parts = blob.name.split("/")
+                                        path_parts = blob_name.split("/")
                                         folder = "/".join(path_parts[:-1])
                                         new_blob_name = f"{folder}/{new_name}"
                                         
                                         # 복사 (Rename은 Copy + Delete)
-                                        source_blob = container_client.get_blob_client(blob.name)
+                                        source_blob = container_client.get_blob_client(blob_name)
                                         dest_blob = container_client.get_blob_client(new_blob_name)
                                         
                                         # SAS URL for Copy Source
-                                        source_sas = generate_sas_url(blob_service_client, CONTAINER_NAME, blob.name)
+                                        source_sas = generate_sas_url(blob_service_client, CONTAINER_NAME, blob_name)
                                         
                                         dest_blob.start_copy_from_url(source_sas)
                                         
@@ -926,6 +1381,7 @@ elif menu == "파일 보관함":
                                         # 원본 삭제
                                         source_blob.delete_blob()
                                         st.success("이름 변경 완료!")
+                                        list_user_blobs.clear()
                                         time.sleep(1)
                                         st.rerun()
                                     except Exception as e:
@@ -933,10 +1389,11 @@ elif menu == "파일 보관함":
 
                         with col3:
                             # 삭제
-                            if st.button("삭제", key=f"del_{prefix}_{i}", type="secondary"):
+                            if st.button("삭제", key=f"del_{tab_name}_{i}", type="secondary"):
                                 try:
-                                    container_client.delete_blob(blob.name)
+                                    container_client.delete_blob(blob_name)
                                     st.success("삭제되었습니다.")
+                                    list_user_blobs.clear()
                                     time.sleep(1)
                                     st.rerun()
                                 except Exception as e:
@@ -963,6 +1420,24 @@ elif menu == "물어보면 답하는 문서 AI":
     from utils.chat_history_utils import load_history, save_history, get_session_title
     SEARCH_HISTORY_FILE = "search_chat_history.json"
 
+    # Storage handle shared by every tab in this menu (upload, search links, citations)
+    blob_service_client = get_blob_service_client()
+    account_name = blob_service_client.account_name
+    sas_credential = get_sas_credential(blob_service_client)
+    
+    # User-folder scope filter depends only on (account, folder, role): build it once per session
+    user_filter_key = (account_name, user_folder, user_role)
+    if st.session_state.get('_user_filter_key') != user_filter_key:
+        if user_role == 'admin':
+            st.session_state['_user_filter_expr'] = None
+        else:
+            # Range query instead of startswith: prefix_url ends with '/' (ASCII 47), next char is '0' (ASCII 48)
+            prefix_url = f"https://{account_name}.blob.core.windows.net/{CONTAINER_NAME}/{urllib.parse.quote(user_folder)}/"
+            upper_bound = prefix_url[:-1] + '0'
+            st.session_state['_user_filter_expr'] = f"metadata_storage_path ge '{prefix_url}' and metadata_storage_path lt '{upper_bound}'"
+        st.session_state['_user_filter_key'] = user_filter_key
+    user_filter_expr = st.session_state['_user_filter_expr']
+
     # Initialize Session State for Search History
     if "search_chat_history_data" not in st.session_state:
         st.session_state.search_chat_history_data = load_history(SEARCH_HISTORY_FILE)
@@ -1063,14 +1538,14 @@ elif menu == "물어보면 답하는 문서 AI":
 
             if doc_upload and st.button("업로드", key="btn_doc_upload"):
                 try:
-                    blob_service_client = get_blob_service_client()
-                    container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+                    container_client = get_container_client()
                     
                     # Upload to {user_folder}/documents/ (Flat structure)
                     blob_name = f"{user_folder}/documents/{doc_upload.name}"
                     blob_client = container_client.get_blob_client(blob_name)
-                    blob_client.upload_blob(doc_upload, overwrite=True)
+                    blob_client.upload_blob(doc_upload, overwrite=True, max_concurrency=8, length=doc_upload.size)
                     st.success(f"'{doc_upload.name}' 업로드 완료! (인덱싱에 시간이 걸릴 수 있습니다)")
+                    list_user_blobs.clear()
                 except Exception as e:
                     st.error(f"업로드 실패: {e}")
             
@@ -1082,30 +1557,20 @@ elif menu == "물어보면 답하는 문서 AI":
             try:
                 search_manager = get_search_manager()
                 
-                # Construct prefix URL for filtering
-                account_name = get_blob_service_client().account_name
-                encoded_user_folder = urllib.parse.quote(user_folder)
-                prefix_url = f"https://{account_name}.blob.core.windows.net/{CONTAINER_NAME}/{encoded_user_folder}/"
-                
-                # Filter logic
-                if user_role == 'admin':
-                    filter_expr = None
-                else:
-                    # Workaround: Use range query instead of startswith if startswith is not supported
-                    # prefix_url ends with '/' (ASCII 47). Next char is '0' (ASCII 48).
-                    # So we want path >= prefix_url AND path < prefix_url_with_next_char
-                    # Actually, let's just use the next char logic safely.
-                    # Or just try startswith again with debug? No, let's try the range.
-                    # prefix_url = .../
-                    # upper_bound = ...0
-                    upper_bound = prefix_url[:-1] + '0'
-                    filter_expr = f"metadata_storage_path ge '{prefix_url}' and metadata_storage_path lt '{upper_bound}'"
+                # Filter logic (precomputed per session)
+                filter_expr = user_filter_expr
                 
                 # Debug
                 # st.write(f"Debug Filter: {filter_expr}")
                 
-                # Search all documents (*)
-                results = search_manager.search("*", filter_expr=filter_expr, top=1000)
+                # Search all documents (*), listing columns only (no content or highlights)
+                results = search_manager.search(
+                    "*",
+                    filter_expr=filter_expr,
+                    top=1000,
+                    select=["metadata_storage_name", "metadata_storage_size", "metadata_storage_last_modified", "metadata_storage_path"],
+                    highlight=False
+                )
                 
                 # Filter out .json files first
                 filtered_results = []
@@ -1193,12 +1658,16 @@ elif menu == "물어보면 답하는 문서 AI":
                                         # Highlights
                                         highlights = result.get('@search.highlights')
                                         if highlights:
-                                            snippets = []
-                                            if 'content' in highlights:
-                                                snippets.extend(highlights['content'])
-                                            if 'content_exact' in highlights:
-                                                snippets.extend(highlights['content_exact'])
-                                            unique_snippets = list(set(snippets))[:3]
+                                            # Keep the top-ranked highlights in order, stop at 3
+                                            seen_snippets = set()
+                                            unique_snippets = []
+                                            for snippet in chain(highlights.get('content', ()), highlights.get('content_exact', ())):
+                                                if snippet in seen_snippets:
+                                                    continue
+                                                seen_snippets.add(snippet)
+                                                unique_snippets.append(snippet)
+                                                if len(unique_snippets) == 3:
+                                                    break
                                             content_snippet = " ... ".join(unique_snippets)
                                         else:
                                             content_snippet = result.get('content', '')[:300] + "..."
@@ -1235,30 +1704,21 @@ elif menu == "물어보면 답하는 문서 AI":
                                         
                                         # Generate SAS link
                                         try:
-                                            blob_service_client = get_blob_service_client()
-                                            from urllib.parse import unquote
+                                            blob_path = blob_path_from_url(path)
                                             
-                                            if "https://direct_fetch/" in path:
-                                                blob_path = unquote(path.replace("https://direct_fetch/", "").split('#')[0])
-                                            elif CONTAINER_NAME in path:
-                                                blob_path = unquote(path.split(f"/{CONTAINER_NAME}/")[1].split('#')[0])
-                                            else:
-                                                blob_path = path
-                                            
-                                            import mimetypes
-                                            content_type, _ = mimetypes.guess_type(file_name)
+                                            content_type = guess_content_type(blob_path) or result.get('metadata_storage_content_type')
                                             
                                             sas_token = generate_blob_sas(
-                                                account_name=blob_service_client.account_name,
+                                                account_name=account_name,
                                                 container_name=CONTAINER_NAME,
                                                 blob_name=blob_path,
-                                                account_key=blob_service_client.credential.account_key,
-                                                permission=BlobSasPermissions(read=True),
+                                                **sas_credential,
+                                                permission=READ_PERMISSION,
                                                 expiry=datetime.utcnow() + timedelta(hours=1),
                                                 content_disposition="inline",
                                                 content_type=content_type
                                             )
-                                            sas_url = f"https://{blob_service_client.account_name}.blob.core.windows.net/{CONTAINER_NAME}/{urllib.parse.quote(blob_path)}?{sas_token}"
+                                            sas_url = f"https://{account_name}.blob.core.windows.net/{CONTAINER_NAME}/{quote_blob_path(blob_path)}?{sas_token}"
                                             
                                             lower_name = file_name.lower()
                                             if lower_name.endswith(('.pptx', '.ppt', '.docx', '.doc', '.xlsx', '.xls')):
@@ -1285,17 +1745,7 @@ elif menu == "물어보면 답하는 문서 AI":
                 with st.spinner("검색 중..."):
                     try:
                         search_manager = get_search_manager()
-                        account_name = get_blob_service_client().account_name
-                        encoded_user_folder = urllib.parse.quote(user_folder)
-                        prefix_url = f"https://{account_name}.blob.core.windows.net/{CONTAINER_NAME}/{encoded_user_folder}/"
-                        
-                        if user_role == 'admin':
-                            filter_expr = None
-                        else:
-                            upper_bound = prefix_url[:-1] + '0'
-                            filter_expr = f"metadata_storage_path ge '{prefix_url}' and metadata_storage_path lt '{upper_bound}'"
-                        
-                        results = search_manager.search(query, filter_expr=filter_expr, use_semantic_ranker=search_use_semantic, search_mode=search_mode)
+                        results = search_manager.search(query, filter_expr=user_filter_expr, use_semantic_ranker=search_use_semantic, search_mode=search_mode)
                         
                         # Filter out .json files
                         filtered_results = [res for res in results if not res.get('metadata_storage_name', '').lower().endswith('.json')]
@@ -1347,20 +1797,10 @@ elif menu == "물어보면 답하는 문서 AI":
                         st.caption("📚 **참조 문서:**")
                         for i, citation in enumerate(message["citations"], 1):
                             filepath = citation.get('filepath', 'Unknown')
-                            # Use pre-generated final_url if available, otherwise generate one
+                            # Use pre-generated final_url if available, otherwise generate one (SAS URLs are cached)
                             display_url = citation.get('final_url')
                             if not display_url:
-                                try:
-                                    blob_service_client = get_blob_service_client()
-                                    display_url = generate_sas_url(
-                                        blob_service_client, 
-                                        CONTAINER_NAME, 
-                                        filepath, 
-                                        page=citation.get('page')
-                                    )
-                                except:
-                                    display_url = "#"
-                            
+                                display_url = get_citation_url(filepath, page=citation.get('page'))
                             st.markdown(f"{i}. [{filepath}]({display_url})")
             
             # -----------------------------
@@ -1388,16 +1828,14 @@ elif menu == "물어보면 답하는 문서 AI":
                 with st.chat_message("assistant"):
                     with st.spinner("답변 생성 중..."):
                         try:
-                            chat_manager = get_chat_manager()
-                            
                             # Prepare conversation history (exclude citations from history)
                             conversation_history = [
                                 {"role": msg["role"], "content": msg["content"]}
                                 for msg in st.session_state.chat_messages[:-1]  # Exclude the just-added user message
                             ]
                             
-                            # Pass the selected search options to the chat manager
-                            response_text, citations, context, final_filter, search_results = chat_manager.get_chat_response(
+                            # Pass the selected search options to the chat manager (repeat questions are served from its cache)
+                            response_text, citations, context, final_filter, search_results = get_chat_manager().get_chat_response(
                                 prompt, 
                                 conversation_history, 
                                 search_mode=chat_search_mode, 
@@ -1419,24 +1857,15 @@ elif menu == "물어보면 답하는 문서 AI":
                                 for cit in citations:
                                     filepath = cit.get('filepath', 'Unknown')
                                     # CRITICAL: Clean filepath from page suffixes like " (p.1)" or " (p.1) (p.1)"
-                                    import re
-                                    clean_filepath = re.sub(r'\s*\(\s*p\.?\s*\d+\s*\)', '', filepath).strip()
+                                    clean_filepath = _CITATION_PAGE_SUFFIX_RE.sub('', filepath).strip()
                                     
                                     page = cit.get('page')
                                     url = cit.get('url', '')
                                     
-                                    # Generate Web Viewer URL
-                                    try:
-                                        blob_service_client = get_blob_service_client()
-                                        final_url = generate_sas_url(
-                                            blob_service_client, 
-                                            CONTAINER_NAME, 
-                                            clean_filepath, 
-                                            page=page
-                                        )
-                                    except Exception as e:
-                                        st.error(f"URL 생성 실패 ({clean_filepath}): {e}")
-                                        final_url = "#"
+                                    # Web Viewer URL: one SAS signature per distinct blob, page anchors appended
+                                    final_url = get_citation_url(clean_filepath, page=page)
+                                    if final_url == "#":
+                                        st.error(f"URL 생성 실패 ({clean_filepath})")
                                     
                                     cit['final_url'] = final_url
                                     processed_citations.append(cit)
@@ -1477,7 +1906,7 @@ elif menu == "물어보면 답하는 문서 AI":
                                     for (k_fname, k_page), url in citation_links.items():
                                         # 2. Clean known filename (remove .pdf and (p.N) suffixes)
                                         clean_known = re.sub(r'\.pdf$', '', k_fname.lower().strip())
-                                        clean_known = re.sub(r'\s*\(\s*p\.?\s*\d+\s*\)', '', clean_known).strip()
+                                        clean_known = _CITATION_PAGE_SUFFIX_RE.sub('', clean_known).strip()
                                         
                                         # CRITICAL FIX: Skip empty filenames to prevent false positive matches
                                         if not clean_known:
@@ -1556,14 +1985,20 @@ elif menu == "물어보면 답하는 문서 AI":
                             # --- Auto-Save History ---
                             current_id = st.session_state.current_search_session_id
                             current_title = st.session_state.search_chat_history_data[current_id]["title"]
+                            title_changed = False
                             if current_title == "새로운 대화" and len(st.session_state.chat_messages) > 0:
                                 new_title = get_session_title(st.session_state.chat_messages)
                                 st.session_state.search_chat_history_data[current_id]["title"] = new_title
+                                title_changed = True
                             
                             st.session_state.search_chat_history_data[current_id]["messages"] = st.session_state.chat_messages
                             st.session_state.search_chat_history_data[current_id]["timestamp"] = datetime.now().isoformat()
                             save_history(SEARCH_HISTORY_FILE, st.session_state.search_chat_history_data)
-                            st.rerun()
+                            
+                            # The new turn is already drawn in place above; only rerun (full history redraw)
+                            # when the sidebar needs the new session title.
+                            if title_changed:
+                                st.rerun()
 
                         except Exception as e:
                             st.error(f"오류가 발생했습니다: {str(e)}")
@@ -1737,8 +2172,10 @@ elif menu == "도면/스펙 비교":
                 
                 if start_analysis:
                     blob_service_client = get_blob_service_client()
-                    container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+                    container_client = get_container_client()
                     doc_intel_manager = get_doc_intel_manager()
+                    account_name = blob_service_client.account_name
+                    sas_credential = get_sas_credential(blob_service_client)
                     search_manager = get_search_manager()
                     
                     progress_bar = st.progress(0)
@@ -1749,7 +2186,6 @@ elif menu == "도면/스펙 비교":
                     for idx, file in enumerate(target_files):
                         try:
                             # Normalize filename to NFC (to match search query logic)
-                            import unicodedata
                             safe_filename = unicodedata.normalize('NFC', file.name)
                             
                             # Save to temp dir for resume capability (only if it's a fresh upload)
@@ -1774,7 +2210,9 @@ elif menu == "도면/스펙 비교":
                             
                             # CRITICAL: Reset file pointer to ensure full upload
                             file.seek(0)
-                            blob_client.upload_blob(file, overwrite=True)
+                            # Parallel block upload for large drawings; validate_content MD5-checks each block in transit,
+                            # which does not catch a short read of the source, so the stored size is verified afterwards
+                            blob_client.upload_blob(file, overwrite=True, max_concurrency=8, length=file.size, validate_content=True)
                             
                             # Verify upload size
                             props = blob_client.get_blob_properties()
@@ -1785,20 +2223,17 @@ elif menu == "도면/스펙 비교":
 
                             # Generate SAS Token for Document Intelligence access
                             sas_token = generate_blob_sas(
-                                account_name=blob_service_client.account_name,
+                                account_name=account_name,
                                 container_name=CONTAINER_NAME,
                                 blob_name=blob_path,
-                                account_key=blob_service_client.credential.account_key,
-                                permission=BlobSasPermissions(read=True),
+                                **sas_credential,
+                                permission=READ_PERMISSION,
                                 expiry=datetime.utcnow() + timedelta(hours=1)
                             )
-                            blob_url = f"https://{blob_service_client.account_name}.blob.core.windows.net/{CONTAINER_NAME}/{urllib.parse.quote(blob_path)}?{sas_token}"
+                            blob_url = f"https://{account_name}.blob.core.windows.net/{CONTAINER_NAME}/{quote_blob_path(blob_path)}?{sas_token}"
                             
                             # 3. Analyze with Document Intelligence (Chunked)
-                            file.seek(0)
-                            pdf_data = file.read()
-                            doc = fitz.open(stream=pdf_data, filetype="pdf")
-                            total_pages = doc.page_count
+                            total_pages = get_pdf_page_count(file)
                             file.seek(0)
                             
                             status_text.text(f"분석 준비 중 ({idx+1}/{total_files}): {file.name} (총 {total_pages} 페이지)")
@@ -1829,6 +2264,7 @@ elif menu == "도면/스펙 비교":
                                 
                                 st.session_state.analysis_status[safe_filename]["processed_pages"] = len(page_chunks)
                             
+                            pending_ranges = []
                             for start_page in range(1, total_pages + 1, chunk_size):
                                 end_page = min(start_page + chunk_size - 1, total_pages)
                                 page_range = f"{start_page}-{end_page}"
@@ -1836,17 +2272,27 @@ elif menu == "도면/스펙 비교":
                                 # Skip if already processed
                                 if page_range in processed_ranges:
                                     st.session_state.analysis_status[safe_filename]["chunks"][page_range] = "Ready"
-                                    # status_text.text(f"스킵 중 ({idx+1}/{total_files}): {file.name} - 페이지 {page_range} (이미 완료됨)")
                                     continue
                                 
                                 st.session_state.analysis_status[safe_filename]["chunks"][page_range] = "Extracting"
-                                status_text.text(f"분석 중 ({idx+1}/{total_files}): {file.name} - 페이지 {page_range} 분석 중...")
-                                
-                                # Retry logic for each chunk
-                                max_retries = 3
-                                for retry in range(max_retries):
-                                    try:
-                                        chunks = doc_intel_manager.analyze_document(blob_url, page_range=page_range, high_res=use_high_res)
+                                pending_ranges.append(page_range)
+                            
+                            # DI calls are IO-bound: analyze page ranges concurrently, report progress as each completes
+                            if pending_ranges:
+                                status_text.text(f"분석 중 ({idx+1}/{total_files}): {file.name} - {len(pending_ranges)}개 구간 병렬 분석 중...")
+                                with ThreadPoolExecutor(max_workers=4) as executor:
+                                    futures = {executor.submit(analyze_range_with_retry, doc_intel_manager, blob_url, r, use_high_res): r for r in pending_ranges}
+                                    for future in as_completed(futures):
+                                        page_range = futures[future]
+                                        try:
+                                            chunks = future.result()
+                                        except Exception as e:
+                                            st.session_state.analysis_status[safe_filename]["chunks"][page_range] = "Failed"
+                                            st.session_state.analysis_status[safe_filename]["error"] = str(e)
+                                            for f in futures:
+                                                f.cancel()
+                                            raise e
+                                        
                                         page_chunks.extend(chunks)
                                         
                                         # Save progress immediately
@@ -1854,17 +2300,10 @@ elif menu == "도면/스펙 비교":
                                         
                                         st.session_state.analysis_status[safe_filename]["chunks"][page_range] = "Ready"
                                         st.session_state.analysis_status[safe_filename]["processed_pages"] += len(chunks)
-                                        break
-                                    except Exception as e:
-                                        if retry == max_retries - 1:
-                                            st.session_state.analysis_status[safe_filename]["chunks"][page_range] = "Failed"
-                                            st.session_state.analysis_status[safe_filename]["error"] = str(e)
-                                            raise e
-                                        
-                                        # Transient error - show friendly message
-                                        wait_time = 5 * (retry + 1)
-                                        status_text.text(f"⏳ 일시적 지연으로 재연결 중 ({retry+1}/{max_retries}): {file.name} - 페이지 {page_range} (약 {wait_time}초 대기)...")
-                                        time.sleep(wait_time)
+                                        status_text.text(f"분석 중 ({idx+1}/{total_files}): {file.name} - 페이지 {page_range} 완료")
+                            
+                            # Chunks complete out of order; restore page order before indexing
+                            page_chunks.sort(key=lambda c: c['page_number'])
                             
                             # 4. Indexing
                             st.session_state.analysis_status[safe_filename]["status"] = "Indexing"
@@ -1872,47 +2311,34 @@ elif menu == "도면/스펙 비교":
                             if len(page_chunks) == 0:
                                 st.warning(f"⚠️ 경고: '{file.name}'에서 페이지를 찾을 수 없습니다.")
                             
-                            documents_to_index = []
-                            for page_chunk in page_chunks:
-                                # Create document object for each page
-                                # ID must be unique and URL safe. Include page number in ID.
-                                import base64
-                                page_id_str = f"{blob_path}_page_{page_chunk['page_number']}"
-                                doc_id = base64.urlsafe_b64encode(page_id_str.encode('utf-8')).decode('utf-8')
-                                
-                                document = {
-                                    "id": doc_id,
-                                    "content": page_chunk['content'],
-                                    "content_exact": page_chunk['content'],
-                                    "metadata_storage_name": f"{safe_filename} (p.{page_chunk['page_number']})",
-                                    "metadata_storage_path": f"https://{blob_service_client.account_name}.blob.core.windows.net/{CONTAINER_NAME}/{blob_path}#page={page_chunk['page_number']}",
-                                    "metadata_storage_last_modified": datetime.utcnow().isoformat() + "Z",
-                                    "metadata_storage_size": file.size,
-                                    "metadata_storage_content_type": file.type,
-                                    "project": "drawings_analysis",  # Tag for filtering
-                                    "title": page_chunk.get('도면명(TITLE)', ''),  # Drawing title
-                                    "drawing_no": page_chunk.get('도면번호(DWG. NO.)', ''),  # Drawing number
-                                    "page_number": page_chunk['page_number'],  # Page number for filtering
-                                    "filename": safe_filename  # Filename for search
-                                }
-                                documents_to_index.append(document)
+                            indexed_at = datetime.utcnow().isoformat() + "Z"
+                            documents_to_index = [
+                                build_page_document(page_chunk, blob_path, safe_filename, account_name, file.size, file.type, indexed_at)
+                                for page_chunk in page_chunks
+                            ]
                             
                             # Batch upload all pages (50 pages at a time to avoid request size limits)
                             indexing_success = True
                             if documents_to_index:
                                 batch_size = 50
-                                for i in range(0, len(documents_to_index), batch_size):
-                                    batch = documents_to_index[i:i + batch_size]
-                                    status_text.text(f"인덱싱 중 ({idx+1}/{total_files}): {safe_filename} - 배치 전송 중 ({i//batch_size + 1}/{(len(documents_to_index)-1)//batch_size + 1})")
-                                    success, msg = search_manager.upload_documents(batch)
-                                    if not success:
-                                        st.error(f"인덱싱 실패 ({file.name}, 배치 {i//batch_size + 1}): {msg}")
-                                        indexing_success = False
-                                        break
+                                batches = [documents_to_index[i:i + batch_size] for i in range(0, len(documents_to_index), batch_size)]
+                                # Send batches concurrently; stop on the first failure
+                                with ThreadPoolExecutor(max_workers=4) as executor:
+                                    futures = {executor.submit(search_manager.upload_documents, batch): batch_no for batch_no, batch in enumerate(batches, 1)}
+                                    for done_count, future in enumerate(as_completed(futures), 1):
+                                        success, msg = future.result()
+                                        if not success:
+                                            st.error(f"인덱싱 실패 ({file.name}, 배치 {futures[future]}): {msg}")
+                                            indexing_success = False
+                                            for f in futures:
+                                                f.cancel()
+                                            break
+                                        status_text.text(f"인덱싱 중 ({idx+1}/{total_files}): {safe_filename} - 배치 전송 중 ({done_count}/{len(batches)})")
                                 
                                 # 5. Save Analysis JSON to Blob Storage (Dual Retrieval Strategy)
                                 # Only save if indexing was successful
                                 if indexing_success:
+                                    delete_stale_page_docs(search_manager, blob_path, page_chunks)
                                     status_text.text(f"분석 결과 저장 중 ({idx+1}/{total_files}): {safe_filename}...")
                                     search_manager.upload_analysis_json(container_client, user_folder, safe_filename, page_chunks)
                                 else:
@@ -1942,6 +2368,7 @@ elif menu == "도면/스펙 비교":
                     # 성공적으로 완료되면 업로더 초기화
                     st.session_state.drawing_uploader_key += 1
                     time.sleep(2)
+                    list_drawing_blobs.clear()
                     st.rerun()
 
             # 📊 분석 모니터링 대시보드
@@ -1985,70 +2412,49 @@ elif menu == "도면/스펙 비교":
             st.markdown("#### 📋 분석된 문서 목록")
             try:
                 blob_service_client = get_blob_service_client()
-                container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+                container_client = get_container_client()
             
                 # List files in user's drawings folder + Admin access to root drawings
-                blobs = []
-                # User folder
-                blobs.extend(list(container_client.list_blobs(name_starts_with=f"{user_folder}/drawings/")))
-            
-                if user_role == 'admin':
-                    # Admin root folder
-                    blobs.extend(list(container_client.list_blobs(name_starts_with="drawings/")))
-            
-                # Deduplicate
-                unique_blobs = {b.name: b for b in blobs}.values()
-            
-                blob_list = []
-                available_filenames = []
-                for blob in unique_blobs:
-                    if not blob.name.endswith('/'):  # Skip folder markers
-                        filename = blob.name.split('/')[-1]
-                        blob_list.append({
-                            'name': filename,
-                            'full_name': blob.name,
-                            'size': blob.size,
-                            'modified': blob.last_modified
-                        })
-                        available_filenames.append(filename)
-            
-                # Sort by modified date (most recent first)
-                blob_list.sort(key=lambda x: x['modified'], reverse=True)
+                if "drawing_list_limit" not in st.session_state:
+                    st.session_state.drawing_list_limit = DRAWING_LIST_PAGE_SIZE
+                blob_list, has_more_blobs = list_drawing_blobs(user_folder, user_role, st.session_state.drawing_list_limit)
+                available_filenames = [b['name'] for b in blob_list]
             
                 selected_filenames = []
             
                 if blob_list:
-                    st.info(f"총 {len(blob_list)}개의 문서가 분석되어 있습니다. 분석할 문서를 선택하세요.")
+                    st.info(f"총 {len(blob_list)}{'+' if has_more_blobs else ''}개의 문서가 분석되어 있습니다. 분석할 문서를 선택하세요.")
                 
-                    # Add "Select All" checkbox
-                    def toggle_all():
-                        new_state = st.session_state.select_all_files
-                        # Update state for ALL files in the list, not just existing keys
-                        for b in blob_list:
-                            st.session_state[f"chk_{b['name']}"] = new_state
-
-                    select_all = st.checkbox("전체 선택", value=False, key="select_all_files", on_change=toggle_all)
-                
-                    # Display as expandable list
+                    # One selectable table instead of a checkbox + button set per row
                     with st.expander("📄 문서 목록 및 선택", expanded=True):
-                        for idx, blob_info in enumerate(blob_list, 1):
-                            # Improved column layout for better zoom stability
-                            # col0: checkbox (3%), col1: filename (59%), col2: 3 icons (27%), col3: delete+JSON (11%)
-                            col0, col1, col2, col3 = st.columns([0.3, 5.9, 2.7, 1.1])
-                            
-                            with col0:
-                                # Checkbox for selection
-                                chk_key = f"chk_{blob_info['name']}"
-                                if chk_key not in st.session_state:
-                                    st.session_state[chk_key] = False
-                                
-                                is_selected = st.checkbox(f"select_{idx}", key=chk_key, label_visibility="collapsed")
-                                if is_selected:
-                                    selected_filenames.append(blob_info['name'])
+                        list_df = pd.DataFrame([
+                            {"파일명": b['name'], "크기 (MB)": round(b['size_mb'], 2), "수정일": b['modified']}
+                            for b in blob_list
+                        ])
+                        # Key follows the listing, so a stale row selection never points at another file
+                        list_key = hashlib.blake2b("\n".join(available_filenames).encode('utf-8'), digest_size=8).hexdigest()
+                        selection = st.dataframe(
+                            list_df,
+                            hide_index=True,
+                            use_container_width=True,
+                            on_select="rerun",
+                            selection_mode="multi-row",
+                            key=f"drawing_list_{list_key}"
+                        )
+                        selected_rows = [i for i in selection.selection.rows if i < len(blob_list)]
+                        selected_filenames = [blob_list[i]['name'] for i in selected_rows]
+                        
+                        # Action buttons are rendered for a single selected document only
+                        action_rows = [blob_list[selected_rows[0]]] if len(selected_rows) == 1 else []
+                        if len(selected_rows) > 1:
+                            st.caption("다운로드/이름 변경/재분석/삭제 버튼은 문서를 하나만 선택하면 표시됩니다.")
+                        
+                        for idx, blob_info in enumerate(action_rows, 1):
+                            # col1: filename (59%), col2: 3 icons (27%), col3: delete+JSON (11%)
+                            col1, col2, col3 = st.columns([5.9, 2.7, 1.1])
                         
                             with col1:
-                                size_mb = blob_info['size'] / (1024 * 1024)
-                                st.markdown(f"**{blob_info['name']}** ({size_mb:.2f} MB)")
+                                st.markdown(f"**{blob_info['name']}** ({blob_info['size_mb']:.2f} MB)")
                         
                             with col2:
                                 # 3 action icons in a row
@@ -2083,75 +2489,58 @@ elif menu == "도면/스펙 비교":
                                                         source_blob = container_client.get_blob_client(old_blob_name)
                                                         dest_blob = container_client.get_blob_client(new_blob_name)
                                                     
-                                                        # Copy
+                                                        # Copy (Put Blob From URL: synchronous server-side copy, no status polling)
+                                                        # Runs in the background while the index pages are looked up
                                                         source_sas = generate_sas_url(blob_service_client, CONTAINER_NAME, old_blob_name)
-                                                        dest_blob.start_copy_from_url(source_sas)
-                                                    
-                                                        # Wait for copy
-                                                        for _ in range(20):
-                                                            props = dest_blob.get_blob_properties()
-                                                            if props.copy.status == "success":
-                                                                break
-                                                            time.sleep(0.2)
+                                                        copy_executor = ThreadPoolExecutor(max_workers=1)
+                                                        copy_future = copy_executor.submit(dest_blob.upload_blob_from_url, source_sas, overwrite=True)
+                                                        copy_executor.shutdown(wait=False)
                                                     
-                                                        # B. Update Search Index (Preserve OCR Data)
+                                                        # B. Update Search Index in place (OCR content stays untouched server-side)
                                                         search_manager = get_search_manager()
-                                                        import unicodedata
-                                                        safe_old_filename = unicodedata.normalize('NFC', blob_info['name'])
-                                                        safe_new_filename = unicodedata.normalize('NFC', new_name_input)
+                                                        safe_old_filename = nfc(blob_info['name'])
+                                                        safe_new_filename = nfc(new_name_input)
                                                     
-                                                        # Find old docs
-                                                        results = search_manager.search_client.search(
-                                                            search_text="*",
-                                                            filter=f"project eq 'drawings_analysis'",
-                                                            select=["id", "content", "content_exact", "metadata_storage_name", "metadata_storage_path", "metadata_storage_size", "metadata_storage_content_type"]
-                                                        )
+                                                        # Find old docs (server-side filter on the file's pages; all fields,
+                                                        # since the pages are re-keyed and uploaded whole)
+                                                        results = search_manager.find_drawing_pages(safe_old_filename)
                                                     
-                                                        docs_to_upload = []
-                                                        ids_to_delete = []
+                                                        # Only pages whose path carries "#page=N" can be re-pointed
+                                                        matches = [d for d in results if '#page=' in (d.get('metadata_storage_path') or '')]
+                                                        if len(matches) != len(results):
+                                                            print(f"WARNING: Skipping {len(results) - len(matches)} pages without '#page=' in path while renaming {safe_old_filename}")
+                                                        new_path_prefix = f"https://{blob_service_client.account_name}.blob.core.windows.net/{CONTAINER_NAME}/{new_blob_name}#page="
+                                                        renamed_at = datetime.utcnow().isoformat() + "Z"
                                                     
-                                                        for doc in results:
-                                                            # Check if this doc belongs to the file (by name prefix)
-                                                            # Name format: "{filename} (p.{page})"
-                                                            if doc['metadata_storage_name'].startswith(safe_old_filename):
-                                                                # Create new doc
-                                                                page_suffix = doc['metadata_storage_name'].split(safe_old_filename)[-1] # e.g. " (p.1)"
-                                                            
-                                                                # New ID
-                                                                import base64
-                                                                # Extract page number from suffix or path if possible, or just reconstruct
-                                                                # Path format: .../filename#page=N
-                                                                try:
-                                                                    page_num = doc['metadata_storage_path'].split('#page=')[-1]
-                                                                    new_page_id_str = f"{new_blob_name}_page_{page_num}"
-                                                                    new_doc_id = base64.urlsafe_b64encode(new_page_id_str.encode('utf-8')).decode('utf-8')
-                                                                
-                                                                    new_doc = {
-                                                                        "id": new_doc_id,
-                                                                        "content": doc['content'],
-                                                                        "content_exact": doc.get('content_exact', doc['content']),
-                                                                        "metadata_storage_name": f"{safe_new_filename}{page_suffix}",
-                                                                        "metadata_storage_path": f"https://{blob_service_client.account_name}.blob.core.windows.net/{CONTAINER_NAME}/{new_blob_name}#page={page_num}",
-                                                                        "metadata_storage_last_modified": datetime.utcnow().isoformat() + "Z",
-                                                                        "metadata_storage_size": doc['metadata_storage_size'],
-                                                                        "metadata_storage_content_type": doc['metadata_storage_content_type'],
-                                                                        "project": "drawings_analysis"
-                                                                    }
-                                                                    docs_to_upload.append(new_doc)
-                                                                    ids_to_delete.append({"id": doc['id']})
-                                                                except:
-                                                                    pass
-                                                                    
-                                                        if docs_to_upload:
-                                                            search_manager.upload_documents(docs_to_upload)
-                                                        if ids_to_delete:
-                                                            search_manager.search_client.delete_documents(documents=ids_to_delete)
+                                                        # Keys are derived from the blob path, so the pages move to the new
+                                                        # path's ids; keeping the old ids would let a later upload under the
+                                                        # old name overwrite the renamed file's pages
+                                                        docs_to_upload = []
+                                                        for doc in matches:
+                                                            page = doc['metadata_storage_path'].rsplit('#page=', 1)[1]
+                                                            new_doc = {k: v for k, v in doc.items() if not k.startswith('@')}
+                                                            new_doc.update({
+                                                                "id": make_page_doc_id(new_blob_name, page),
+                                                                # Name format: "{filename} (p.{page})" -> keep the page suffix
+                                                                "metadata_storage_name": f"{safe_new_filename}{doc['metadata_storage_name'][len(safe_old_filename):]}",
+                                                                "metadata_storage_path": f"{new_path_prefix}{page}",
+                                                                "metadata_storage_last_modified": renamed_at,
+                                                                "filename": safe_new_filename  # Keeps the renamed pages reachable by the filename filter
+                                                            })
+                                                            docs_to_upload.append(new_doc)
+                                                        new_ids = {doc['id'] for doc in docs_to_upload}
+                                                        old_ids = [{"id": doc['id']} for doc in matches if doc['id'] not in new_ids]
+                                                        # Only re-point the index once the new blob exists (re-raises a failed copy)
+                                                        copy_future.result()
+                                                        search_manager.index_in_batches("upload_documents", docs_to_upload)
+                                                        search_manager.index_in_batches("delete_documents", old_ids)
 
                                                         # C. Delete old blob
                                                         source_blob.delete_blob()
                                                     
                                                         st.success("이름 변경 완료!")
                                                         time.sleep(1)
+                                                        list_drawing_blobs.clear()
                                                         st.rerun()
                                                     
                                                 except Exception as e:
@@ -2162,15 +2551,9 @@ elif menu == "도면/스펙 비교":
                                     if st.button("🔄", key=f"reanalyze_{blob_info['name']}", help="재분석 (인덱스 복구)", use_container_width=True):
                                         try:
                                             with st.spinner("재분석 시작... (파일 다운로드 중)"):
-                                                # A. Download Blob to memory
+                                                # A/B. Count Pages (DI reads the blob via SAS; no full in-memory download)
                                                 blob_client = container_client.get_blob_client(blob_info['full_name'])
-                                                download_stream = blob_client.download_blob()
-                                                pdf_data = download_stream.readall()
-                                            
-                                                # B. Count Pages
-                                                import fitz
-                                                doc = fitz.open(stream=pdf_data, filetype="pdf")
-                                                total_pages = doc.page_count
+                                                total_pages = get_blob_pdf_page_count(blob_client)
                                             
                                                 # C. Initialize Status
                                                 if "analysis_status" not in st.session_state:
@@ -2195,13 +2578,13 @@ elif menu == "도면/스펙 비교":
                                                     account_name=blob_service_client.account_name,
                                                     container_name=CONTAINER_NAME,
                                                     blob_name=blob_info['full_name'],
-                                                    account_key=blob_service_client.credential.account_key,
-                                                    permission=BlobSasPermissions(read=True),
+                                                    **get_sas_credential(blob_service_client),
+                                                    permission=READ_PERMISSION,
                                                     expiry=datetime.utcnow() + timedelta(hours=1)
                                                 )
                                                 # Use relative path for URL construction if needed, but full_name is usually relative to container if listed from container_client?
                                                 # container_client.list_blobs returns name relative to container.
-                                                blob_url = f"https://{blob_service_client.account_name}.blob.core.windows.net/{CONTAINER_NAME}/{urllib.parse.quote(blob_info['full_name'])}?{sas_token}"
+                                                blob_url = f"https://{blob_service_client.account_name}.blob.core.windows.net/{CONTAINER_NAME}/{quote_blob_path(blob_info['full_name'])}?{sas_token}"
                                             
                                                 chunk_size = 50
                                                 page_chunks = []
@@ -2209,71 +2592,63 @@ elif menu == "도면/스펙 비교":
                                                 progress_bar = st.progress(0)
                                                 status_text = st.empty()
                                             
+                                                page_ranges = []
                                                 for start_page in range(1, total_pages + 1, chunk_size):
                                                     end_page = min(start_page + chunk_size - 1, total_pages)
                                                     page_range = f"{start_page}-{end_page}"
-                                                
                                                     st.session_state.analysis_status[safe_filename]["chunks"][page_range] = "Extracting"
-                                                    status_text.text(f"재분석 중: {safe_filename} ({page_range})...")
+                                                    page_ranges.append(page_range)
+                                                
+                                                status_text.text(f"재분석 중: {safe_filename} ({len(page_ranges)}개 구간 병렬 분석)...")
                                                 
-                                                    # Retry logic
-                                                    max_retries = 3
-                                                    for retry in range(max_retries):
+                                                # Analyze ranges concurrently (default high_res=False for re-analysis)
+                                                with ThreadPoolExecutor(max_workers=min(8, len(page_ranges) or 1)) as executor:
+                                                    futures = {executor.submit(analyze_range_with_retry, doc_intel_manager, blob_url, r): r for r in page_ranges}
+                                                    for done_count, future in enumerate(as_completed(futures), 1):
+                                                        page_range = futures[future]
                                                         try:
-                                                            # Use default high_res=False for re-analysis
-                                                            chunks = doc_intel_manager.analyze_document(blob_url, page_range=page_range, high_res=False)
-                                                            page_chunks.extend(chunks)
-                                                            st.session_state.analysis_status[safe_filename]["chunks"][page_range] = "Ready"
-                                                            st.session_state.analysis_status[safe_filename]["processed_pages"] += len(chunks)
-                                                            break
+                                                            chunks = future.result()
                                                         except Exception as e:
-                                                            if retry == max_retries - 1:
-                                                                st.session_state.analysis_status[safe_filename]["chunks"][page_range] = "Failed"
-                                                                st.session_state.analysis_status[safe_filename]["error"] = str(e)
-                                                                raise e
-                                                            time.sleep(5 * (retry + 1))
+                                                            st.session_state.analysis_status[safe_filename]["chunks"][page_range] = "Failed"
+                                                            st.session_state.analysis_status[safe_filename]["error"] = str(e)
+                                                            for f in futures:
+                                                                f.cancel()
+                                                            raise e
+                                                        page_chunks.extend(chunks)
+                                                        st.session_state.analysis_status[safe_filename]["chunks"][page_range] = "Ready"
+                                                        st.session_state.analysis_status[safe_filename]["processed_pages"] += len(chunks)
+                                                        progress_bar.progress(done_count / len(page_ranges))
+                                                        status_text.text(f"재분석 중: {safe_filename} ({page_range} 완료)")
+                                                
+                                                # Restore page order (ranges complete out of order)
+                                                page_chunks.sort(key=lambda c: c['page_number'])
                                             
                                                 # E. Indexing
                                                 st.session_state.analysis_status[safe_filename]["status"] = "Indexing"
                                                 status_text.text("인덱싱 중...")
                                             
-                                                documents_to_index = []
-                                                for page_chunk in page_chunks:
-                                                    import base64
-                                                    # Use full_name (path in container) for ID generation to match upload logic
-                                                    page_id_str = f"{blob_info['full_name']}_page_{page_chunk['page_number']}"
-                                                    doc_id = base64.urlsafe_b64encode(page_id_str.encode('utf-8')).decode('utf-8')
-                                                
-                                                    document = {
-                                                        "id": doc_id,
-                                                        "content": page_chunk['content'],
-                                                        "content_exact": page_chunk['content'],
-                                                        "metadata_storage_name": f"{safe_filename} (p.{page_chunk['page_number']})",
-                                                        "metadata_storage_path": f"https://{blob_service_client.account_name}.blob.core.windows.net/{CONTAINER_NAME}/{blob_info['full_name']}#page={page_chunk['page_number']}",
-                                                        "metadata_storage_last_modified": datetime.utcnow().isoformat() + "Z",
-                                                        "metadata_storage_size": blob_info['size'],
-                                                        "metadata_storage_content_type": "application/pdf",
-                                                        "project": "drawings_analysis",
-                                                        "title": page_chunk.get('도면명(TITLE)', ''),  # Drawing title
-                                                        "drawing_no": page_chunk.get('도면번호(DWG. NO.)', ''),  # Drawing number
-                                                        "page_number": page_chunk['page_number'],  # Page number for filtering
-                                                        "filename": safe_filename  # Filename for search
-                                                    }
-                                                    documents_to_index.append(document)
+                                                # Use full_name (path in container) for ID generation to match upload logic
+                                                indexed_at = datetime.utcnow().isoformat() + "Z"
+                                                documents_to_index = [
+                                                    build_page_document(page_chunk, blob_info['full_name'], safe_filename, blob_service_client.account_name, blob_info['size'], "application/pdf", indexed_at)
+                                                    for page_chunk in page_chunks
+                                                ]
                                             
                                                 if documents_to_index:
-                                                    batch_size = 50
-                                                    for i in range(0, len(documents_to_index), batch_size):
-                                                        batch = documents_to_index[i:i + batch_size]
-                                                        success, msg = search_manager.upload_documents(batch)
-                                                        if not success:
-                                                            st.error(f"❌ 인덱스 업로드 실패 (배치 {i//batch_size + 1}): {msg}")
-                                                            raise Exception(f"Index upload failed: {msg}")
+                                                    # Buffered sender: automatic batching, throttling retries and oversized-batch splitting
+                                                    success, msg = search_manager.upload_documents_buffered(documents_to_index)
+                                                    if not success:
+                                                        st.error(f"❌ 인덱스 업로드 실패: {msg}")
+                                                        raise Exception(f"Index upload failed: {msg}")
+                                                
+                                                    delete_stale_page_docs(search_manager, blob_info['full_name'], page_chunks)
                                                 
                                                     # Save JSON only if upload succeeded
                                                     search_manager.upload_analysis_json(container_client, user_folder, safe_filename, page_chunks)
                                             
                                                 st.session_state.analysis_status[safe_filename]["status"] = "Ready"
+                                                # Re-analysis rewrites the JSON but not the PDF, so its ETag can't invalidate the copy
+                                                st.session_state.get("analysis_json_cache", {}).pop(blob_info['name'], None)
                                                 st.success("재분석 완료! 이제 검색이 가능합니다.")
                                                 time.sleep(1)
                                                 st.rerun()
@@ -2283,9 +2658,13 @@ elif menu == "도면/스펙 비교":
 
                                 # 3. JSON (Admin only)
                                 if user_role == 'admin':
-                                    json_key = f"json_data_{blob_info['name']}"
+                                    # Serialized JSON is cached per file and reused while the blob's ETag is unchanged
+                                    json_cache = st.session_state.setdefault("analysis_json_cache", {})
+                                    cached_json = json_cache.get(blob_info['name'])
+                                    if cached_json and cached_json[0] != blob_info['etag']:
+                                        cached_json = None
                                 
-                                    if json_key not in st.session_state:
+                                    if cached_json is None:
                                         if st.button("JSON", key=f"gen_json_{blob_info['name']}"):
                                             with st.spinner("..."):
                                                 search_manager = get_search_manager()
@@ -2298,17 +2677,16 @@ elif menu == "도면/스펙 비교":
                                                     docs = search_manager.get_document_json(blob_info['name'])
                                                 
                                                 if docs:
-                                                    import json
                                                     json_str = json.dumps(docs, ensure_ascii=False, indent=2)
-                                                    st.session_state[json_key] = json_str
+                                                    json_cache[blob_info['name']] = (blob_info['etag'], json_str)
                                                     st.rerun()
                                                 else:
                                                     st.error(f"No Data found for '{blob_info['name']}'")
                                                     # Try one more time without project filter to see if it exists at all
-                                                    safe_name = blob_info['name'].replace("'", "''")
+                                                    # (name prefix filter: indexer docs have no 'filename' field, page docs are "x.pdf (p.N)")
                                                     debug_docs = search_manager.search_client.search(
                                                         search_text="*",
-                                                        filter=f"search.ismatch('\"{safe_name}*\"', 'metadata_storage_name')",
+                                                        filter=odata_prefix_filter("metadata_storage_name", blob_info['name']),
                                                         select=["metadata_storage_name", "project"],
                                                         top=5
                                                     )
@@ -2319,7 +2697,7 @@ elif menu == "도면/스펙 비교":
                                                         st.error("Document not found in index at all.")
                                     else:
                                         # Show download button
-                                        json_data = st.session_state[json_key]
+                                        json_data = cached_json[1]
                                         st.download_button(
                                             label="💾",
                                             data=json_data,
@@ -2339,48 +2717,27 @@ elif menu == "도면/스펙 비교":
                                         search_manager = get_search_manager()
                                     
                                         # Find docs to delete
-                                        import unicodedata
-                                        safe_filename = unicodedata.normalize('NFC', blob_info['name'])
+                                        safe_filename = nfc(blob_info['name'])
                                     
-                                        # Clean up index (Find ALL pages)
-                                        ids_to_delete = []
-                                        while True:
-                                            results = search_manager.search_client.search(
-                                                search_text="*",
-                                                filter=f"project eq 'drawings_analysis'",
-                                                select=["id", "metadata_storage_name"],
-                                                top=1000
-                                            )
-                                        
-                                            batch_ids = []
-                                            for doc in results:
-                                                # Use NFC normalization for comparison
-                                                doc_name = unicodedata.normalize('NFC', doc['metadata_storage_name'])
-                                                if doc_name.startswith(safe_filename):
-                                                    batch_ids.append({"id": doc['id']})
-                                        
-                                            if not batch_ids:
-                                                break
-                                            
-                                            search_manager.search_client.delete_documents(documents=batch_ids)
-                                            ids_to_delete.extend(batch_ids)
-                                        
-                                            # If we found less than 1000, we might be done, but to be safe we continue 
-                                            # until a search returns no matches for our file.
-                                            # Actually, if we delete them, the next search will return different docs.
-                                            # So we continue until no more docs match.
-                                            if len(batch_ids) == 0:
-                                                break
+                                        # Clean up index (Find ALL pages with one server-side filtered query; queried fresh,
+                                        # not from the 60s listing cache, so pages added meanwhile are not left behind)
+                                        ids_to_delete = [{"id": doc['id']} for doc in search_manager.find_drawing_pages(safe_filename, select=["id"])]
+                                        # Bulk delete, 1000-action index batches sent concurrently
+                                        search_manager.index_in_batches("delete_documents", ids_to_delete)
                                     
                                         # Clear JSON state if exists
-                                        json_key = f"json_data_{blob_info['name']}"
-                                        if json_key in st.session_state:
-                                            del st.session_state[json_key]
+                                        st.session_state.get("analysis_json_cache", {}).pop(blob_info['name'], None)
 
                                         st.success(f"{blob_info['name']} 삭제 완료")
+                                        list_drawing_blobs.clear()
                                         st.rerun()
                                     except Exception as e:
                                         st.error(f"삭제 실패: {e}")
+                    
+                    # Load the next window of blobs
+                    if has_more_blobs and st.button("더 보기", key="drawing_list_more"):
+                        st.session_state.drawing_list_limit += DRAWING_LIST_PAGE_SIZE
+                        st.rerun()
                 else:
                     st.warning("분석된 문서가 없습니다. '문서 업로드 및 분석' 탭에서 문서를 업로드하세요.")
             except Exception as e:
@@ -2431,16 +2788,7 @@ elif menu == "도면/스펙 비교":
                             # Use pre-generated final_url if available, otherwise generate one
                             display_url = citation.get('final_url')
                             if not display_url:
-                                try:
-                                    blob_service_client = get_blob_service_client()
-                                    display_url = generate_sas_url(
-                                        blob_service_client, 
-                                        CONTAINER_NAME, 
-                                        filepath, 
-                                        page=citation.get('page')
-                                    )
-                                except:
-                                    display_url = "#"
+                                display_url = get_citation_url(filepath, page=citation.get('page'))
                         
                             st.markdown(f"{i}. [{filepath}]({display_url})")
 
@@ -2485,6 +2833,19 @@ elif menu == "도면/스펙 비교":
                             else:
                                 final_prompt += "\n\n[OUTPUT INSTRUCTION]: Please summarize the comparison in **Structured Markdown Text**. Do NOT use a table."
 
+                            # Show the answer as it is generated; the linkified version replaces it below.
+                            # Redraws are throttled (one websocket update per interval, not per token)
+                            stream_placeholder = st.empty()
+                            streamed_parts = []
+                            last_render = [0.0]
+                            
+                            def show_partial_answer(token):
+                                streamed_parts.append(token)
+                                now = time.monotonic()
+                                if now - last_render[0] >= STREAM_RENDER_INTERVAL_SECONDS:
+                                    last_render[0] = now
+                                    stream_placeholder.markdown("".join(streamed_parts) + "▌")
+                            
                             response_text, citations, context, final_filter, search_results = chat_manager.get_chat_response(
                                 final_prompt, 
                                 conversation_history,
@@ -2493,8 +2854,11 @@ elif menu == "도면/스펙 비교":
                                 filter_expr=base_filter,
                                 available_files=current_files,
                                 user_folder=user_folder,
-                                is_admin=(user_role == 'admin')
+                                is_admin=(user_role == 'admin'),
+                                on_token=show_partial_answer,
+                                highlight=True  # Snippets for the "검색 결과 및 스니펫" expander
                             )
+                            stream_placeholder.empty()
 
                             # ---------------------------------------------------------
                             # CRITICAL: Linkify Inline Citations & Escape Tildes
@@ -2508,24 +2872,15 @@ elif menu == "도면/스펙 비교":
                                 for cit in citations:
                                     filepath = cit.get('filepath', 'Unknown')
                                     # CRITICAL: Clean filepath from page suffixes like " (p.1)" or " (p.1) (p.1)"
-                                    import re
-                                    clean_filepath = re.sub(r'\s*\(\s*p\.?\s*\d+\s*\)', '', filepath).strip()
+                                    clean_filepath = _CITATION_PAGE_SUFFIX_RE.sub('', filepath).strip()
                                     
                                     page = cit.get('page')
                                     url = cit.get('url', '')
                                     
-                                    # Generate Web Viewer URL
-                                    try:
-                                        blob_service_client = get_blob_service_client()
-                                        final_url = generate_sas_url(
-                                            blob_service_client, 
-                                            CONTAINER_NAME, 
-                                            clean_filepath, 
-                                            page=page
-                                        )
-                                    except Exception as e:
-                                        st.error(f"URL 생성 실패 ({clean_filepath}): {e}")
-                                        final_url = "#"
+                                    # Web Viewer URL: one SAS signature per distinct blob, page anchors appended
+                                    final_url = get_citation_url(clean_filepath, page=page)
+                                    if final_url == "#":
+                                        st.error(f"URL 생성 실패 ({clean_filepath})")
                                     
                                     cit['final_url'] = final_url
                                     processed_citations.append(cit)
@@ -2566,7 +2921,7 @@ elif menu == "도면/스펙 비교":
                                     for (k_fname, k_page), url in citation_links.items():
                                         # 2. Clean known filename (remove .pdf and (p.N) suffixes)
                                         clean_known = re.sub(r'\.pdf$', '', k_fname.lower().strip())
-                                        clean_known = re.sub(r'\s*\(\s*p\.?\s*\d+\s*\)', '', clean_known).strip()
+                                        clean_known = _CITATION_PAGE_SUFFIX_RE.sub('', clean_known).strip()
                                         
                                         # CRITICAL FIX: Skip empty filenames to prevent false positive matches
                                         if not clean_known:
@@ -2663,39 +3018,22 @@ elif menu == "도면/스펙 비교":
                                     
                                         # Generate SAS link for the result
                                         try:
-                                            # Extract blob path from metadata_storage_path
-                                            from urllib.parse import unquote
-                                            import re
-                                        
-                                            if "https://direct_fetch/" in res_path:
-                                                # Handle custom direct fetch scheme
-                                                path_without_scheme = res_path.replace("https://direct_fetch/", "")
-                                                blob_path_part = path_without_scheme.split('#')[0]
-                                                blob_path_part = unquote(blob_path_part)
-                                            elif CONTAINER_NAME in res_path:
-                                                # Handle standard Azure Blob URL
-                                                blob_path_part = res_path.split(f"/{CONTAINER_NAME}/")[1].split('#')[0]
-                                                blob_path_part = unquote(blob_path_part)
-                                            else:
-                                                # Fallback or relative path
-                                                blob_path_part = res_path
-                                        
-                                            # CRITICAL FIX: Strip " (p.N)" suffix if present in the path
-                                            # This happens if the indexer appended it to the path
-                                            blob_path_part = re.sub(r'\s*\(p\.\d+\)$', '', blob_path_part)
+                                            # Blob URL / direct_fetch scheme -> decoded blob name, minus any " (p.N)"
+                                            # suffix the indexer appended to the path
+                                            blob_path_part = result_blob_path(res_path)
                                             
                                             # Generate SAS Token
                                             sas_token = generate_blob_sas(
                                                 account_name=blob_service_client.account_name,
                                                 container_name=CONTAINER_NAME,
                                                 blob_name=blob_path_part,
-                                                account_key=blob_service_client.credential.account_key,
-                                                permission=BlobSasPermissions(read=True),
+                                                **get_sas_credential(blob_service_client),
+                                                permission=READ_PERMISSION,
                                                 expiry=datetime.utcnow() + timedelta(hours=1),
                                                 content_disposition="inline",
                                                 content_type="application/pdf" # Default to PDF for viewer hint
                                             )
-                                            sas_url = f"https://{blob_service_client.account_name}.blob.core.windows.net/{CONTAINER_NAME}/{urllib.parse.quote(blob_path_part, safe='/')}?{sas_token}"
+                                            sas_url = f"https://{blob_service_client.account_name}.blob.core.windows.net/{CONTAINER_NAME}/{quote_blob_path(blob_path_part)}?{sas_token}"
 
                                             # Use Office Online Viewer for Office files ONLY
                                             # PDF files use direct SAS URL (browser viewer) for better page linking
@@ -2735,7 +3073,7 @@ elif menu == "도면/스펙 비교":
                                     pg = cit.get('page')
                                     
                                     # Clean filepath
-                                    clean_fp = re.sub(r'\s*\(\s*p\.?\s*\d+\s*\)', '', fp).strip()
+                                    clean_fp = _CITATION_PAGE_SUFFIX_RE.sub('', fp).strip()
                                     
                                     if pg:
                                         try:
@@ -2836,21 +3174,16 @@ elif menu == "디버그 (Debug)":
 
     search_manager = get_search_manager()
     blob_service_client = get_blob_service_client()
-    container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+    container_client = get_container_client()
 
     # Fetch list of files for selection (Filter for drawings only)
     blob_list = []
     try:
-        blobs = container_client.list_blobs()
-        for b in blobs:
-            # Filter: Must be a file (not folder) AND must be in a 'drawings' folder
-            if not b.name.endswith('/') and '/drawings/' in b.name:
-                blob_list.append(b.name)
+        # Only the drawings/ folders are listed (server-side prefixes), cached across reruns; sorted by filename
+        blob_list = list_drawing_blob_names(CONTAINER_NAME)
     except Exception as e:
         st.error(f"Failed to list blobs: {e}")
     
-    blob_list.sort(key=lambda x: x.split('/')[-1]) # Sort by filename
-    
     target_blob = st.selectbox("Select Target File", blob_list)
     
     # Extract filename for search
@@ -2869,23 +3202,13 @@ elif menu == "디버그 (Debug)":
         # Search for ALL pages (including chunks like "filename (p.1)")
         try:
             # Search Strategy: Look for documents where metadata_storage_name starts with the filename
-            # This will catch both the main file and all page chunks
-            import unicodedata
-            norm_filename = unicodedata.normalize('NFC', filename)
-            
-            # Use text search for the filename and then filter client-side
-            results = search_manager.search_client.search(
-                search_text=f"\"{filename}\"",
-                search_mode="all",
+            # This will catch both the main file and all page chunks (prefix matched by the index)
+            results = list(search_manager.search_client.search(
+                search_text="*",
+                filter=odata_prefix_filter("metadata_storage_name", filename),
                 select=["id", "metadata_storage_name", "metadata_storage_path", "project", "content"],
                 top=1000  # Increase to capture all pages
-            )
-            
-            # Filter to get documents that start with our filename (including page chunks)
-            results = [
-                doc for doc in results 
-                if unicodedata.normalize('NFC', doc.get('metadata_storage_name', '')).startswith(norm_filename)
-            ]
+            ))
             
         except Exception as e:
             st.warning(f"Search failed ({str(e)}). This might indicate an indexing issue.")
@@ -2914,15 +3237,12 @@ elif menu == "디버그 (Debug)":
             path = first['metadata_storage_path']
             blob_path = None
             
-            if "https://direct_fetch/" in path:
+            if path.startswith(DIRECT_FETCH_PREFIX):
                 st.warning("⚠️ Using 'direct_fetch' scheme. This is a virtual path.")
-                blob_path = path.replace("https://direct_fetch/", "").split('#')[0]
-            elif CONTAINER_NAME in path:
-                try:
-                    blob_path = path.split(f"/{CONTAINER_NAME}/")[1].split('#')[0]
-                    blob_path = urllib.parse.unquote(blob_path)
-                except:
-                    pass
+            # Decoded once here; the SDK client takes the plain name and encodes it itself
+            blob_path = blob_path_from_url(path)
+            if blob_path == path:
+                blob_path = None  # neither a blob URL nor direct_fetch
             
             if blob_path:
                 st.write(f"**Extracted Blob Path:** `{blob_path}`")
@@ -2934,11 +3254,12 @@ elif menu == "디버그 (Debug)":
                     
                     # Search for it
                     st.write("Searching for file in container...")
-                    found_blobs = list(container_client.list_blobs(name_starts_with=os.path.dirname(blob_path)))
+                    # Reuse the drawings listing fetched for the file selector (no second listing round trip)
+                    blob_dir = os.path.dirname(blob_path)
+                    found_blobs = [name for name in blob_list if name.startswith(blob_dir)]
                     if found_blobs:
                         st.write("Found similar blobs:")
-                        for b in found_blobs:
-                            st.code(b.name)
+                        st.dataframe({"Blob": found_blobs}, use_container_width=True, hide_index=True)
                     else:
                         st.warning("No similar blobs found.")
             else:
@@ -2946,7 +3267,8 @@ elif menu == "디버그 (Debug)":
 
             # 3. List Page Check
             st.subheader("3. List Page Check")
-            list_keywords = ["PIPING AND INSTRUMENT DIAGRAM FOR LIST", "DRAWING LIST", "도면 목록"]
+            # Keywords are ASCII-uppercase or caseless (Hangul), so an ASCII-only bytes.upper() is enough
+            list_keywords = (b"PIPING AND INSTRUMENT DIAGRAM FOR LIST", b"DRAWING LIST", "도면 목록".encode('utf-8'))
             found_list = False
             
             for doc in results:
@@ -2956,8 +3278,8 @@ elif menu == "디버그 (Debug)":
                     content = ""
                     st.warning(f"⚠️ Document '{doc['metadata_storage_name']}' has NO CONTENT (NULL).")
                 
-                content_upper = content.upper()
-                if any(k in content_upper for k in list_keywords):
+                content_upper = content.encode('utf-8', 'ignore').upper()
+                if any(content_upper.find(k) >= 0 for k in list_keywords):
                     st.success(f"✅ Found List Page! Name: `{doc['metadata_storage_name']}`")
                     st.text_area("Content Preview", content[:500], height=150)
                     found_list = True
@@ -2999,17 +3321,19 @@ elif menu == "디버그 (Debug)":
                     select=["metadata_storage_name", "project", "metadata_storage_last_modified"],
                     top=20
                 )
-                peek_list = list(peek_results)
-                if peek_list:
-                    st.write(f"Index contains at least {len(peek_list)} documents. Here are the top 20:")
-                    peek_data = []
-                    for d in peek_list:
-                        peek_data.append({
-                            "Name": d.get('metadata_storage_name'),
-                            "Project": d.get('project'),
-                            "Modified": d.get('metadata_storage_last_modified')
-                        })
-                    st.table(peek_data)
+                # Columns filled in one pass and handed to Streamlit as an Arrow table (no per-row dicts)
+                names, projects, modifieds = [], [], []
+                for d in peek_results:
+                    names.append(d.get('metadata_storage_name'))
+                    projects.append(d.get('project'))
+                    modifieds.append(d.get('metadata_storage_last_modified'))
+                if names:
+                    st.write(f"Index contains at least {len(names)} documents. Here are the top 20:")
+                    st.dataframe(
+                        pa.table({"Name": names, "Project": projects, "Modified": modifieds}),
+                        use_container_width=True,
+                        hide_index=True
+                    )
                 else:
                     st.error("⚠️ The Index appears to be COMPLETELY EMPTY.")
             except Exception as e:
@@ -3024,11 +3348,6 @@ elif menu == "디버그 (Debug)":
             
             # Secret Inspector
             st.write("### 🔐 자격 증명 확인 (Secret Inspector)")
-            def mask_secret(s):
-                if not s: return "Not Set"
-                if len(s) <= 8: return "*" * len(s)
-                return s[:4] + "*" * (len(s)-8) + s[-4:]
-            
             secrets_to_check = {
                 "AZURE_STORAGE_CONNECTION_STRING": STORAGE_CONN_STR,
                 "AZURE_BLOB_CONTAINER_NAME": CONTAINER_NAME,
@@ -3041,12 +3360,11 @@ elif menu == "디버그 (Debug)":
                 "AZURE_DOC_INTEL_KEY": AZURE_DOC_INTEL_KEY
             }
             
-            import pandas as pd
-            secret_data = []
-            for k, v in secrets_to_check.items():
-                secret_data.append({"Secret Key": k, "Status": "✅ Loaded" if v else "❌ Missing", "Value (Masked)": mask_secret(v)})
-            
-            st.table(pd.DataFrame(secret_data))
+            # st.table renders a list of dicts directly (no DataFrame needed)
+            st.table([
+                {"Secret Key": k, "Status": "✅ Loaded" if v else "❌ Missing", "Value (Masked)": _mask_secret(v)}
+                for k, v in secrets_to_check.items()
+            ])
             
             st.write("---")
             
@@ -3055,44 +3373,58 @@ elif menu == "디버그 (Debug)":
                     search_manager = get_search_manager()
                     client = search_manager.search_client
                     
-                    st.write("### 1. 인덱스 문서 확인 (project='drawings_analysis')")
-                    results = client.search(search_text="*", filter="project eq 'drawings_analysis'", select=["id", "metadata_storage_name", "project"], top=20)
+                    # Sections 1 and 3 read the same query; the three independent queries run concurrently,
+                    # so the whole report costs about one round trip. Totals come from $count.
+                    def run_query(search_text, **kwargs):
+                        results = client.search(search_text=search_text, top=5, include_total_count=True, **kwargs)
+                        docs = list(results)
+                        return results.get_count(), docs
                     
-                    docs = list(results)
-                    st.write(f"Found {len(docs)} docs with project='drawings_analysis'")
+                    with ThreadPoolExecutor(max_workers=3) as executor:
+                        drawings_future = executor.submit(run_query, "*", filter="project eq 'drawings_analysis'", select=["id", "metadata_storage_name", "project", "content"])
+                        overview_future = executor.submit(run_query, "*", select=["id", "metadata_storage_name", "project"])
+                        keyword_future = executor.submit(run_query, "foundation loading data", filter="project eq 'drawings_analysis'", select=["metadata_storage_name", "content"])
+                    drawings_total, docs = drawings_future.result()
+                    total_all, docs_all = overview_future.result()
+                    keyword_total, search_docs = keyword_future.result()
+                    
+                    st.write("### 1. 인덱스 문서 확인 (project='drawings_analysis')")
+                    st.write(f"Found {drawings_total} docs with project='drawings_analysis' (showing {len(docs)})")
                     
                     if docs:
-                        for doc in docs:
-                            st.code(f"ID: {doc['id']}\nName: {doc['metadata_storage_name']}\nProject: {doc['project']}")
+                        st.dataframe(
+                            [{"ID": doc['id'], "Name": doc['metadata_storage_name'], "Project": doc['project']} for doc in docs],
+                            use_container_width=True,
+                            hide_index=True
+                        )
                     
                     st.write("---")
                     st.write("### 1-B. 인덱스 문서 확인 (전체 - 필터 없음)")
-                    results_all = client.search(search_text="*", select=["id", "metadata_storage_name", "project"], top=20)
-                    docs_all = list(results_all)
-                    st.write(f"Found {len(docs_all)} docs in total (top 20)")
-                    for doc in docs_all:
-                        proj = doc.get('project', 'None')
-                        st.code(f"Name: {doc['metadata_storage_name']}\nProject: {proj}")
+                    st.write(f"Found {total_all} docs in total (showing {len(docs_all)})")
+                    st.dataframe(
+                        [{"Name": doc['metadata_storage_name'], "Project": doc.get('project', 'None')} for doc in docs_all],
+                        use_container_width=True,
+                        hide_index=True
+                    )
                     
                     st.write("---")
                     st.write("### 2. 키워드 검색 테스트 ('foundation loading data')")
-                    search_results = client.search(search_text="foundation loading data", filter="project eq 'drawings_analysis'", top=5, select=["metadata_storage_name", "content"])
-                    search_docs = list(search_results)
-                    
-                    st.write(f"검색 결과: {len(search_docs)}개")
-                    for doc in search_docs:
-                        st.text(f"Match: {doc['metadata_storage_name']}")
-                        st.caption(f"Content: {doc['content'][:200]}...")
+                    st.write(f"검색 결과: {keyword_total}개 (상위 {len(search_docs)}개 표시)")
+                    st.dataframe(
+                        [{"Match": doc['metadata_storage_name'], "Content": f"{(doc.get('content') or '')[:200]}..."} for doc in search_docs],
+                        use_container_width=True,
+                        hide_index=True
+                    )
                     
                     st.write("---")
                     st.write("### 3. 와일드카드 검색 테스트 ('*')")
-                    wild_results = client.search(search_text="*", filter="project eq 'drawings_analysis'", top=5, select=["metadata_storage_name", "content"])
-                    wild_docs = list(wild_results)
-                    
-                    st.write(f"검색 결과: {len(wild_docs)}개")
-                    for doc in wild_docs:
-                        st.text(f"Match: {doc['metadata_storage_name']}")
-                        st.caption(f"Content: {doc['content'][:200]}...")
+                    # Same result set as section 1 (wildcard over the drawings project)
+                    st.write(f"검색 결과: {drawings_total}개 (상위 {len(docs)}개 표시)")
+                    st.dataframe(
+                        [{"Match": doc['metadata_storage_name'], "Content": f"{(doc.get('content') or '')[:200]}..."} for doc in docs],
+                        use_container_width=True,
+                        hide_index=True
+                    )
                         
                 except Exception as e:
                     st.error(f"진단 중 오류 발생: {str(e)}")
@@ -3104,17 +3436,11 @@ elif menu == "디버그 (Debug)":
                 with st.spinner("인덱스 조회 중..."):
                     try:
                         search_manager = get_search_manager()
-                        # Get all docs (limit to top 1000 to be safe)
-                        results = search_manager.search("*", select=["metadata_storage_name"], top=1000)
-                        indexed_files = set()
-                        for res in results:
-                            # Remove page suffix (p.N) to get base filename
-                            name = res['metadata_storage_name']
-                            base_name = name.split(' (p.')[0]
-                            indexed_files.add(base_name)
+                        # Distinct file names aggregated by the index (facets), page suffixes removed
+                        indexed_files = search_manager.list_indexed_filenames()
                         
                         st.write(f"총 {len(indexed_files)}개의 파일이 인덱스에서 발견되었습니다.")
-                        st.dataframe(list(indexed_files), use_container_width=True)
+                        st.dataframe(indexed_files, use_container_width=True)
                     except Exception as e:
                         st.error(f"조회 실패: {e}")
 
@@ -3140,9 +3466,11 @@ elif menu == "디버그 (Debug)":
                         st.write(f"검색 결과: {len(docs)}개")
                         
                         if docs:
-                            for doc in docs:
-                                st.text(f"Match: {doc['metadata_storage_name']}")
-                                st.caption(f"Content: {doc['content'][:200]}...")
+                            st.dataframe(
+                                [{"Match": doc['metadata_storage_name'], "Content": f"{(doc.get('content') or '')[:200]}..."} for doc in docs],
+                                use_container_width=True,
+                                hide_index=True
+                            )
                         else:
                             st.warning("검색 결과가 없습니다.")
                     except Exception as e:
@@ -3154,35 +3482,33 @@ elif menu == "디버그 (Debug)":
                 try:
                     # 1. Delete all blobs in any drawings/, json/ folder (Global reset)
                     blob_service_client = get_blob_service_client()
-                    container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+                    container_client = get_container_client()
                     
-                    # List all blobs and filter for drawings or json
-                    blobs = container_client.list_blobs()
-                    deleted_blobs = 0
-                    for blob in blobs:
-                        if '/drawings/' in blob.name or blob.name.startswith('drawings/') or '/json/' in blob.name or blob.name.startswith('json/'):
-                            container_client.delete_blob(blob.name)
-                            deleted_blobs += 1
+                    # List only the drawings/ and json/ folders (server-side prefixes), then batch-delete concurrently
+                    deleted_blobs = delete_blobs_bulk(container_client, list_blob_names_under(container_client, ["drawings", "json"]))
+                    list_drawing_blobs.clear()
+                    list_drawing_blob_names.clear()
                     
                     # 2. Delete all docs in index with project='drawings_analysis'
                     search_manager = get_search_manager()
                     
-                    deleted_total = 0
+                    deleted_ids = set()
                     while True:
-                        results = search_manager.search_client.search(
-                            search_text="*",
-                            filter="project eq 'drawings_analysis'",
-                            select=["id"],
-                            top=1000
-                        )
-                        ids_to_delete = [{"id": doc['id']} for doc in results]
+                        # One sequential cursor, ids only (up to 100,000 per pass; the loop picks up the rest).
+                        # Deletes become visible with a short delay, so ids already deleted in a previous pass are skipped
+                        ids_to_delete = [
+                            {"id": doc_id}
+                            for doc_id in search_manager.collect_document_ids("project eq 'drawings_analysis'")
+                            if doc_id not in deleted_ids
+                        ]
                         if not ids_to_delete:
                             break
-                            
-                        search_manager.search_client.delete_documents(documents=ids_to_delete)
-                        deleted_total += len(ids_to_delete)
-                        if len(ids_to_delete) < 1000:
-                            break
+                        
+                        # Every 1000-action batch in flight at once (8 workers over the shared transport)
+                        search_manager.index_in_batches("delete_documents", ids_to_delete, max_workers=8)
+                        deleted_ids.update(doc['id'] for doc in ids_to_delete)
+                    deleted_total = len(deleted_ids)
+                    clear_index_query_caches()
                     
                     st.success(f"모든 도면 데이터가 삭제되었습니다. (Blob 삭제 완료, Index {deleted_total}개 삭제 완료) 이제 파일을 다시 업로드하세요.")
                     st.rerun()
@@ -3192,24 +3518,21 @@ elif menu == "디버그 (Debug)":
             if st.button("🧹 '페이지 번호 없는' 중복 데이터 정리 (권장)", help="인덱스에서 (p.N) 형식이 아닌 잘못된 데이터를 찾아 삭제합니다."):
                 try:
                     search_manager = get_search_manager()
+                    # The index returns only names without a "(p." token (Lucene regex on the name terms);
+                    # the Python check below is a safety net so a valid page is never deleted
                     results = search_manager.search_client.search(
                         search_text="*",
-                        filter="project eq 'drawings_analysis'",
-                        select=["id", "metadata_storage_name"],
-                        top=1000
+                        filter="project eq 'drawings_analysis' and not search.ismatch('/.*\\(p\\..*/', 'metadata_storage_name', 'full', 'any')",
+                        select=["id", "metadata_storage_name"]
                     )
                     
-                    ids_to_delete = []
-                    count = 0
-                    for doc in results:
-                        name = doc['metadata_storage_name']
-                        # Delete if it doesn't contain "(p." (standard page suffix)
-                        if "(p." not in name:
-                            ids_to_delete.append({"id": doc['id']})
-                            count += 1
+                    # Delete if it doesn't contain "(p." (standard page suffix)
+                    ids_to_delete = [{"id": doc['id']} for doc in results if "(p." not in (doc.get('metadata_storage_name') or '')]
+                    count = len(ids_to_delete)
                     
                     if ids_to_delete:
-                        search_manager.search_client.delete_documents(documents=ids_to_delete)
+                        search_manager.index_in_batches("delete_documents", ids_to_delete)
+                        clear_index_query_caches()
                         st.success(f"정리 완료! {count}개의 중복/잘못된 문서를 삭제했습니다.")
                         st.rerun()
                     else:
@@ -3221,28 +3544,29 @@ elif menu == "디버그 (Debug)":
             if st.button("🏷️ 누락된 'drawings_analysis' 태그 복구", help="드로잉 폴더에 있지만 프로젝트 태그가 없는 문서를 찾아 태그를 추가합니다."):
                 try:
                     search_manager = get_search_manager()
-                    # Search for all docs with missing project tag and filter path in Python
+                    # Phase 1: ids + paths only for docs with a missing project tag, path filtered in Python
                     results = search_manager.search_client.search(
                         search_text="*",
                         filter="(project eq null)",
-                        select=["id", "metadata_storage_name", "metadata_storage_path", "content", "content_exact", "metadata_storage_last_modified", "metadata_storage_size", "metadata_storage_content_type"],
+                        select=["id", "metadata_storage_path"],
                         top=10000 # Increase to cover all docs
                     )
                     
-                    docs_to_fix = []
-                    for doc in results:
-                        # Filter by path in Python
-                        if '/drawings/' in doc.get('metadata_storage_path', ''):
-                            doc['project'] = 'drawings_analysis'
-                            docs_to_fix.append(doc)
+                    docs_to_fix = [
+                        {"id": doc['id'], "project": "drawings_analysis"}
+                        for doc in results
+                        if '/drawings/' in (doc.get('metadata_storage_path') or '')
+                    ]
                     
                     if docs_to_fix:
-                        success, msg = search_manager.upload_documents(docs_to_fix)
-                        if success:
+                        # Phase 2: merge only the project field (content is never downloaded or re-sent)
+                        failed = [r.key for r in search_manager.index_in_batches("merge_documents", docs_to_fix) if not r.succeeded]
+                        clear_index_query_caches()
+                        if not failed:
                             st.success(f"복구 완료! {len(docs_to_fix)}개의 문서에 'drawings_analysis' 태그를 추가했습니다.")
                             st.rerun()
                         else:
-                            st.error(f"복구 실패: {msg}")
+                            st.error(f"복구 실패: {len(failed)}개 문서 (예: {', '.join(failed[:5])})")
                     else:
                         st.info("태그를 복구할 문서가 없습니다.")
                 except Exception as e:
@@ -3253,22 +3577,10 @@ elif menu == "디버그 (Debug)":
                     search_manager = get_search_manager()
                     
                     # Count drawings_analysis
-                    drawings_res = search_manager.search_client.search(
-                        search_text="*",
-                        filter="project eq 'drawings_analysis'",
-                        include_total_count=True,
-                        top=0
-                    )
-                    drawings_count = drawings_res.get_count()
+                    drawings_count = cached_index_count("project eq 'drawings_analysis'")
                     
                     # Count others (likely standard indexed)
-                    others_res = search_manager.search_client.search(
-                        search_text="*",
-                        filter="project eq null",
-                        include_total_count=True,
-                        top=0
-                    )
-                    others_count = others_res.get_count()
+                    others_count = cached_index_count("project eq null")
                     
                     st.write(f"**도면 분석 데이터 (drawings_analysis):** {drawings_count}개")
                     st.write(f"**일반 문서 데이터 (Standard Indexer):** {others_count}개")
@@ -3310,69 +3622,85 @@ elif menu == "디버그 (Debug)":
                         
                         # Use a more inclusive search for diagnosis
                         # If query is provided, use it as search_text. If not, use *
-                        results = search_manager.search_client.search(
-                            search_text=diag_query if diag_query else "*",
-                            select=["metadata_storage_name", "project", "metadata_storage_path"],
+                        results = cached_index_search(
+                            diag_query if diag_query else "*",
+                            select=("metadata_storage_name", "project", "metadata_storage_path"),
                             top=1000 # Increase for better diagnosis
                         )
                         
-                        dump_data = []
-                        for doc in results:
-                            name = doc.get('metadata_storage_name', '')
-                            path = doc.get('metadata_storage_path', '')
-                            
-                            if diag_path_filter and '/drawings/' not in path:
-                                continue
-                                
-                            dump_data.append({
-                                "Name": name,
-                                "Project": doc.get('project'),
-                                "Path": path
-                            })
+                        # Filter fused into one comprehension, then columns projected for the Arrow table
+                        drawings_marker = '/drawings/'
+                        matched = [
+                            doc for doc in results
+                            if not diag_path_filter or drawings_marker in (doc.get('metadata_storage_path') or '')
+                        ]
+                        names, projects, paths = (list(col) for col in zip(*map(_diag_fields, matched))) if matched else ([], [], [])
                         
-                        if dump_data:
-                            st.write(f"검색 결과: {len(dump_data)}개의 문서 발견")
-                            st.table(dump_data)
+                        if names:
+                            st.write(f"검색 결과: {len(names)}개의 문서 발견")
+                            st.dataframe(
+                                pa.table({"Name": names, "Project": projects, "Path": paths}),
+                                use_container_width=True,
+                                hide_index=True
+                            )
                         else:
                             st.warning("검색 결과가 없습니다. 파일명이 인덱스에 존재하지 않거나 필터에 걸러졌을 수 있습니다.")
                             
                         # Extra check: Search by path only if query failed
-                        if diag_query and not dump_data:
+                        if diag_query and not names:
                             st.info(f"'{diag_query}'로 검색된 결과가 없어 경로 기반으로 다시 찾습니다...")
-                            # Use startswith on metadata_storage_path (SimpleField/Filterable)
-                            # We don't know the full prefix, but we can try to find anything in drawings
+                            # Name prefix on the server (no project constraint: untagged '/drawings/' docs are
+                            # exactly what this check diagnoses); the path check stays client-side because the
+                            # user folder in front of '/drawings/' varies
                             path_results = search_manager.search_client.search(
                                 search_text="*",
-                                filter="startswith(metadata_storage_path, 'https://')", # Broad filter
+                                filter=odata_prefix_filter("metadata_storage_name", diag_query.strip()),
                                 select=["metadata_storage_name", "project", "metadata_storage_path"],
-                                top=5000 # Increase to cover more docs
+                                top=1000
                             )
-                            # Filter for '/drawings/' in Python for maximum reliability
-                            path_data = [
-                                {"Name": d['metadata_storage_name'], "Project": d['project'], "Path": d['metadata_storage_path']} 
-                                for d in path_results 
-                                if '/drawings/' in d.get('metadata_storage_path', '')
-                            ]
-                            if path_data:
-                                st.write("'/drawings/' 경로에서 발견된 파일들 (최근 100개 중):")
-                                st.table(path_data[:20])
+                            path_rows = [
+                                _diag_fields(d) for d in path_results 
+                                if '/drawings/' in (d.get('metadata_storage_path') or '')
+                            ][:20]  # Only 20 rows are shown
+                            if path_rows:
+                                st.write("'/drawings/' 경로에서 발견된 파일들 (최대 20개):")
+                                path_names, path_projects, path_paths = (list(col) for col in zip(*path_rows))
+                                st.table(pa.table({"Name": path_names, "Project": path_projects, "Path": path_paths}))
                             else:
                                 st.error("'/drawings/' 경로에서 문서를 찾을 수 없습니다. 인덱서가 해당 폴더를 스캔하지 않았을 수 있습니다.")
                                 
                     except Exception as e:
                         st.error(f"진단 중 오류 발생: {e}")
-                        results_list = list(results)
-                        st.info(f"검색된 청크(Chunk) 수: {len(results_list)}개")
-                        
-                        total_chars = 0
-                        for i, doc in enumerate(results_list):
-                            content = doc.get('content', '')
-                            char_count = len(content)
-                            total_chars += char_count
-                            
-                            with st.expander(f"Chunk {i+1}: {doc.get('metadata_storage_name')} ({char_count}자)"):
-                                st.code(content[:1000] + ("..." if len(content) > 1000 else ""))
+                
+                # Token estimate for what the chat would read for this query (own query: the listing above
+                # does not select content)
+                if st.button("🧮 토큰 수 분석 (상위 100개 청크)"):
+                    try:
+                        results = get_search_manager().search_client.search(
+                            search_text=diag_query if diag_query else "*",
+                            select=["metadata_storage_name", "content"],
+                            include_total_count=True,
+                            top=100
+                        )
+                        # Stream the pager: only a 1000-char preview per chunk is kept, rendered as one table
+                        chunk_names, chunk_chars, chunk_previews = [], [], []
+                        for doc in results:
+                            content = doc.get('content') or ''
+                            chunk_names.append(doc.get('metadata_storage_name'))
+                            chunk_chars.append(len(content))
+                            chunk_previews.append(content[:1000] + ("..." if len(content) > 1000 else ""))
+                        chunk_count = len(chunk_names)
+                        total_chars = sum(chunk_chars)
                         
+                        # Total match count from $count on the same query; the table holds at most the fetched page
+                        st.info(f"검색된 청크(Chunk) 수: {results.get_count()}개 (표시: {chunk_count}개)")
+                        with st.expander("상세 내용 표시", expanded=False):
+                            st.dataframe(
+                                pa.table({"#": list(range(1, chunk_count + 1)), "Chunk": chunk_names, "Chars": chunk_chars, "Preview": chunk_previews}),
+                                use_container_width=True,
+                                hide_index=True,
+                                height=400
+                            )
                         st.divider()
                         st.metric("총 글자 수 (Total Characters)", f"{total_chars:,}")
                         est_tokens = int(total_chars / 4)
@@ -3424,12 +3752,8 @@ if menu == "관리자 설정":
     # 폴더 목록 가져오기
     folder_options = ["(전체)"]
     try:
-        blob_service_client = get_blob_service_client()
-        container_client = blob_service_client.get_container_client(CONTAINER_NAME)
-        # walk_blobs를 사용하여 최상위 폴더만 조회
-        for blob in container_client.walk_blobs(delimiter='/'):
-            if blob.name.endswith('/'):
-                folder_options.append(blob.name.strip('/'))
+        # walk_blobs를 사용하여 최상위 폴더만 조회 (5분 캐시, 위젯 조작마다 다시 조회하지 않음)
+        folder_options.extend(list_top_level_folders(CONTAINER_NAME))
     except Exception as e:
         st.warning(f"폴더 목록을 가져오지 못했습니다: {e}")
         folder_options.append("GULFLNG") # Fallback
@@ -3445,6 +3769,9 @@ if menu == "관리자 설정":
         index=default_idx,
         help="인덱싱할 프로젝트 폴더를 선택하세요."
     )
+    if st.button("🔄 폴더 목록 새로고침"):
+        list_top_level_folders.clear()
+        st.rerun()
     
     
     # '(전체)' 선택 시 None으로 처리
@@ -3531,27 +3858,12 @@ if menu == "관리자 설정":
             else:
                 st.error(msg)
                 
-            # 2. Data Source (폴더별)
-            st.write(f"2. Data Source 생성 중... (폴더: {selected_folder})")
-            success, msg, datasource_name = manager.create_data_source(
-                SEARCH_DATASOURCE_NAME, 
-                STORAGE_CONN_STR, 
-                CONTAINER_NAME, 
-                query=target_folder,
-                folder_name=target_folder
-            )
-            if success:
-                st.success(msg)
-            else:
-                st.error(msg)
-                st.stop()  # Stop execution if datasource creation fails
-                
             # 2.5 Skillset (OCR) - Optional
             skillset_name = None
+            cog_key = None
             enable_ocr = st.checkbox("📸 OCR(이미지 텍스트 추출) 활성화", value=False, help="PDF 도면이나 이미지 파일에서 텍스트를 추출합니다. Azure AI Services 키가 필요하며 비용이 발생할 수 있습니다.")
             
             if enable_ocr:
-                st.write(f"2.5. Skillset (OCR) 생성 중...")
                 # Use Translator Key as Cognitive Services Key (assuming it's a multi-service key)
                 cog_key = st.secrets.get("AZURE_TRANSLATOR_KEY", os.environ.get("AZURE_TRANSLATOR_KEY"))
                 
@@ -3559,12 +3871,42 @@ if menu == "관리자 설정":
                     st.warning("⚠️ Azure AI Services 키(AZURE_TRANSLATOR_KEY)가 설정되지 않아 OCR을 건너뜁니다.")
                 else:
                     skillset_name = f"skillset-{target_folder}" if target_folder else "skillset-all"
-                    success, msg = manager.create_skillset(skillset_name, cog_key)
-                    if success:
-                        st.success(msg)
-                    else:
-                        st.error(f"Skillset 생성 실패: {msg}")
-                        skillset_name = None # Fallback to no skillset
+            
+            def ensure_skillset():
+                # 이미 있는 Skillset은 다시 PUT하지 않음
+                if manager.skillset_exists(skillset_name):
+                    return True, f"Skillset '{skillset_name}' already exists."
+                return manager.create_skillset(skillset_name, cog_key)
+            
+            # Data Source와 Skillset은 서로 독립적이므로 동시에 요청 (Indexer는 둘 다 필요하므로 이후에 생성)
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                datasource_future = executor.submit(
+                    manager.create_data_source,
+                    SEARCH_DATASOURCE_NAME, 
+                    STORAGE_CONN_STR, 
+                    CONTAINER_NAME, 
+                    query=target_folder,
+                    folder_name=target_folder
+                )
+                skillset_future = executor.submit(ensure_skillset) if skillset_name else None
+            
+            # 2. Data Source (폴더별)
+            st.write(f"2. Data Source 생성 중... (폴더: {selected_folder})")
+            success, msg, datasource_name = datasource_future.result()
+            if success:
+                st.success(msg)
+            else:
+                st.error(msg)
+                st.stop()  # Stop execution if datasource creation fails
+                
+            if skillset_future:
+                st.write(f"2.5. Skillset (OCR) 생성 중...")
+                success, msg = skillset_future.result()
+                if success:
+                    st.success(msg)
+                else:
+                    st.error(f"Skillset 생성 실패: {msg}")
+                    skillset_name = None # Fallback to no skillset
                 
             # 3. Indexer (폴더별)
             st.write(f"3. Indexer 생성 중... (폴더: {selected_folder})")
@@ -3584,13 +3926,16 @@ if menu == "관리자 설정":
     # ------------------------------------------------------------------
     st.subheader("🔍 인덱스 내용 조회 (OCR 확인용)")
     with st.expander("특정 파일의 인덱싱된 내용 확인하기"):
-        target_filename = st.text_input("확인할 파일명 (예: drawing.pdf)", help="정확한 파일명을 입력하세요.")
+        target_filenames_raw = st.text_area("확인할 파일명 (예: drawing.pdf)", help="정확한 파일명을 입력하세요. 여러 파일은 한 줄에 하나씩 입력합니다.")
         if st.button("내용 조회"):
-            if target_filename:
+            target_filenames = list(dict.fromkeys(line.strip() for line in target_filenames_raw.splitlines() if line.strip()))
+            if target_filenames:
                 manager = get_search_manager()
                 with st.spinner("조회 중..."):
-                    content = manager.get_document_content(target_filename)
-                    st.text_area("인덱싱된 내용 (앞부분 2000자)", content[:2000], height=300)
+                    contents = manager.get_documents_content(target_filenames)
+                    for tab, (name, content) in zip(st.tabs(list(contents)), contents.items()):
+                        with tab:
+                            st.text_area("인덱싱된 내용 (앞부분 2000자)", content[:2000], height=300, key=f"indexed_content_{name}")
             else:
                 st.warning("파일명을 입력하세요.")
 
@@ -3600,16 +3945,56 @@ if menu == "관리자 설정":
     st.info(f"📂 **현재 선택된 폴더**: {selected_folder}")
     st.markdown("수동 인덱서 실행은 선택한 폴더의 새 파일 또는 변경된 파일을 검색 엔진에 반영합니다.")
     
+    extra_run_folders = st.multiselect(
+        "함께 실행할 다른 폴더 (선택사항)",
+        [f for f in folder_options if f != selected_folder],
+        help="인덱서가 이미 생성된 폴더만 실행됩니다."
+    )
+    
     confirm_run = st.checkbox("위 폴더를 인덱싱하는 것을 확인했으며, 진행하고 싶습니다.", key="confirm_run")
     
     if st.button("▶️ 인덱서 수동 실행", disabled=not confirm_run):
         manager = get_search_manager()
-        success, msg = manager.run_indexer(target_folder)
-        if success:
-            st.success(msg)
-            st.info("인덱싱이 시작되었습니다. 아래 '상태 확인' 버튼을 눌러 진행 상황을 모니터링하세요.")
-        else:
-            st.error(msg)
+        run_folders = [target_folder] + [None if f == "(전체)" else f for f in extra_run_folders]
+        # 인덱서 실행 요청은 백그라운드로 보내고 버튼은 즉시 반환 (결과는 아래 상태 패널에서 확인)
+        executor = get_background_executor()
+        st.session_state["indexer_runs"] = {folder or "(전체)": executor.submit(manager.run_indexer, folder) for folder in run_folders}
+        cached_indexer_status.clear()
+    
+    indexer_runs = st.session_state.get("indexer_runs")
+    if indexer_runs:
+        runs_pending = not all(future.done() for future in indexer_runs.values())
+        
+        # 요청이 남아 있는 동안만 1초마다 이 영역을 다시 그림
+        @st.fragment(run_every=1 if runs_pending else None)
+        def _render_indexer_runs():
+            pending = [folder for folder, future in indexer_runs.items() if not future.done()]
+            with st.status(
+                f"인덱서 실행 요청 중... ({len(pending)}개 대기)" if pending else "인덱서 실행 요청 완료",
+                state="running" if pending else "complete"
+            ):
+                any_started = False
+                for folder, future in indexer_runs.items():
+                    if not future.done():
+                        st.write(f"⏳ {folder}")
+                        continue
+                    success, msg = future.result()
+                    if success:
+                        any_started = True
+                        st.success(msg)
+                    else:
+                        st.error(f"{folder}: {msg}")
+                if not pending and any_started:
+                    st.info("인덱싱이 시작되었습니다. 아래 '상태 확인' 버튼을 눌러 진행 상황을 모니터링하세요.")
+            if not pending:
+                if runs_pending:
+                    # 모두 끝나면 전체 재실행으로 주기 갱신을 멈춤
+                    st.rerun()
+                else:
+                    # 결과를 한 번 표시했으므로 이후 재실행에서는 패널을 다시 그리지 않음
+                    st.session_state.pop("indexer_runs", None)
+        
+        _render_indexer_runs()
             
     # Add Delete Indexer Button
     if st.button("🛑 인덱서 삭제 (자동 인덱싱 중지)", help="자동으로 실행되는 인덱서를 삭제하여 중복 인덱싱을 방지합니다."):
@@ -3628,17 +4013,21 @@ if menu == "관리자 설정":
         st.markdown("### 📊 인덱싱 현황 모니터링")
     with col_refresh:
         auto_refresh = st.checkbox("자동 새로고침 (5초)", value=False)
+        if st.button("🔄 캐시 무효화", help="소스 파일 수와 인덱스 문서 수를 즉시 다시 조회합니다."):
+            cached_source_blob_count.clear()
+            cached_document_count.clear()
+            cached_indexer_status.clear()
 
     # 상태 확인 로직 (버튼 클릭 또는 자동 새로고침)
-    if st.button("상태 및 진행률 확인") or auto_refresh:
-        manager = get_search_manager()
-        
+    # 자동 새로고침은 fragment 주기 실행으로 처리: sleep으로 스크립트를 붙잡지 않고 이 영역만 5초마다 다시 그림
+    @st.fragment(run_every=5 if auto_refresh else None)
+    def _render_indexing_status():
         # 1. 소스 파일 개수 확인 (진행률 계산용)
         with st.spinner("소스 파일 개수 계산 중..."):
-            total_blobs = manager.get_source_blob_count(STORAGE_CONN_STR, CONTAINER_NAME, folder_path=target_folder)
+            total_blobs = cached_source_blob_count(CONTAINER_NAME, target_folder)
         
         # 2. 인덱서 상태 확인
-        status_info = manager.get_indexer_status(target_folder)
+        status_info = cached_indexer_status(target_folder)
         
         # 상태 언팩
         status = status_info.get("status")
@@ -3649,7 +4038,7 @@ if menu == "관리자 설정":
         warnings = status_info.get("warnings", [])
         
         # 3. 인덱스 문서 개수
-        doc_count = manager.get_document_count()
+        doc_count = cached_document_count()
         
         # UI 표시
         st.metric(label="총 소스 파일 수", value=f"{total_blobs}개")
@@ -3665,9 +4054,6 @@ if menu == "관리자 설정":
         # 상태 메시지
         if status == "inProgress":
             st.info(f"⏳ 인덱싱 진행 중... (처리된 문서: {item_count}, 실패: {failed_count})")
-            if auto_refresh:
-                time.sleep(5)
-                st.rerun()
         elif status == "success":
             st.success(f"✅ 인덱싱 완료! (총 인덱스 문서: {doc_count}개)")
         elif status == "error":
@@ -3688,6 +4074,14 @@ if menu == "관리자 설정":
             with st.expander("⚠️ 경고 로그 확인"):
                 for warn in warnings:
                     st.warning(f"- {warn}")
+
+    status_clicked = st.button("상태 및 진행률 확인")
+    if status_clicked:
+        # 명시적으로 누른 경우에는 캐시를 비우고 최신 상태를 조회
+        cached_indexer_status.clear()
+        cached_document_count.clear()
+    if status_clicked or auto_refresh:
+        _render_indexing_status()
     
     st.divider()
     
@@ -3817,10 +4211,10 @@ if menu == "디버그 (Debug)":
     if st.button("🚀 2단계 검색 실행", type="primary"):
         st.markdown("---")
         
-        # Build filter
+        # Build filter: name prefix on the filterable field (also matches "name (p.N)" page docs, no analyzer)
         filter_expr = None
         if test_filename and test_filename.strip():
-            filter_expr = f"search.ismatch('{test_filename}', 'metadata_storage_name')"
+            filter_expr = odata_prefix_filter("metadata_storage_name", test_filename.strip())
         
         # Stage 1: Exact search
         st.subheader("📍 Stage 1: 정확한 키워드 검색 (쿼리 확장 없음)")
@@ -3920,7 +4314,7 @@ if menu == "디버그 (Debug)":
             # Build filter
             filter_expr = None
             if filename and filename.strip():
-                filter_expr = f"search.ismatch('{filename}', 'metadata_storage_name')"
+                filter_expr = odata_prefix_filter("metadata_storage_name", filename.strip())
             
             # Execute search
             results = search_manager.search(
@@ -4227,7 +4621,7 @@ elif menu == "디버그 (Debug)":
         
         filter_expr = None
         if deep_file and deep_file.strip():
-            filter_expr = f"search.ismatch('{deep_file}', 'metadata_storage_name')"
+            filter_expr = odata_prefix_filter("metadata_storage_name", deep_file.strip())
             
         with st.spinner("랭킹 분석 중..."):
             # Ensure search_manager is available (it's initialized at top level)
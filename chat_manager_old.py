@@ -1,8 +1,20 @@
+import bisect
+import hashlib
+import itertools
 import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
 from openai import AzureOpenAI
 from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+# Force-fetched chunks are reused across follow-up questions on the same selected files
+FORCE_CACHE_TTL_SECONDS = 5 * 60
+FORCE_CACHE_MAX_ENTRIES = 512
+
 class AzureOpenAIChatManager:
     def __init__(self, endpoint, api_key, deployment_name, api_version, 
                  search_manager, storage_connection_string, container_name):
@@ -18,6 +30,10 @@ class AzureOpenAIChatManager:
         self.search_manager = search_manager
         self.storage_connection_string = storage_connection_string
         self.container_name = container_name
+        # Key: (user_folder, target_file, sha256(query), search_mode), Value: (stored_at, top-3 chunks)
+        self._force_cache = OrderedDict()
+        # Force fetches run in executor threads; lookups, LRU moves and evictions happen under this lock
+        self._force_cache_lock = threading.Lock()
         
         # System prompt optimized for technical accuracy and table interpretation
         self.system_prompt = """You are an expert EPC (Engineering, Procurement, and Construction) project assistant with deep knowledge in interpreting technical drawings and documents.
@@ -82,6 +98,8 @@ You must interpret the provided text as if you are looking at an engineering dia
 
 9. **Language**: Respond in Korean unless asked otherwise.
 """
+        # Immutable; every request reuses the same leading system message
+        self._system_message = {"role": "system", "content": self.system_prompt}
 
     def _extract_filename_filter(self, user_message, available_files):
         """
@@ -152,7 +170,54 @@ Convert the user's natural language question into a keyword-based search query.
             print(f"DEBUG: Query rewriting failed: {e}")
             return user_message
 
-    def get_chat_response(self, user_message, conversation_history=None, search_mode="any", use_semantic_ranker=False, filter_expr=None, available_files=None):
+    def _force_fetch_file(self, target_file, force_query, search_mode, user_folder=None):
+        """
+        Fetch the top chunks of a selected file that is missing from the search results
+        """
+        cache_key = (user_folder, target_file, hashlib.sha256(force_query.encode('utf-8')).hexdigest(), search_mode)
+        with self._force_cache_lock:
+            cached = self._force_cache.get(cache_key)
+            if cached and time.monotonic() - cached[0] < FORCE_CACHE_TTL_SECONDS:
+                self._force_cache.move_to_end(cache_key)
+            else:
+                cached = None
+        if cached:
+            print(f"DEBUG: Force fetch cache hit for '{target_file}'")
+            return cached[1]
+        
+        print(f"DEBUG: Selected file '{target_file}' missing from results. Force fetching...")
+        safe_target = target_file.replace("'", "''")
+        
+        # Use a broad search for this file to get relevant chunks if possible, 
+        # otherwise just get any chunks (using *)
+        # We try to use the original query first restricted to this file
+        forced_results = self.search_manager.search(
+            force_query,
+            filter_expr=f"startswith(metadata_storage_name, '{safe_target}')",
+            use_semantic_ranker=False, # Speed up
+            search_mode=search_mode
+        )
+        
+        # If query yielded nothing for this file, just get the first few pages (Introduction/Summary)
+        if not forced_results:
+            forced_results = self.search_manager.search(
+                "*",
+                filter_expr=f"startswith(metadata_storage_name, '{safe_target}')",
+                use_semantic_ranker=False,
+                search_mode="all"
+            )
+        
+        # Take top 3 chunks from this file to ensure it's represented
+        forced_results = (forced_results or [])[:3]
+        if forced_results:
+            with self._force_cache_lock:
+                self._force_cache[cache_key] = (time.monotonic(), forced_results)
+                self._force_cache.move_to_end(cache_key)
+                while len(self._force_cache) > FORCE_CACHE_MAX_ENTRIES:
+                    self._force_cache.popitem(last=False)
+        return forced_results
+
+    def get_chat_response(self, user_message, conversation_history=None, search_mode="any", use_semantic_ranker=False, filter_expr=None, available_files=None, user_folder=None):
         """
         Get chat response with client-side RAG
         """
@@ -257,53 +322,34 @@ Convert the user's natural language question into a keyword-based search query.
             # 4. Force Inclusion of Selected Files (CRITICAL for Comparison)
             # If user selected files but they didn't appear in the top results, force fetch them.
             if available_files:
-                # Get set of filenames already in results
-                # Normalize: remove extension, lower case for comparison
-                found_filenames = set()
-                for res in search_results:
-                    fname = res.get('metadata_storage_name', '')
-                    found_filenames.add(fname)
+                # Sorted (NFC) filenames already in results: every name starting with a target
+                # sorts right at or after the target, so one binary search per target suffices
+                found_sorted = sorted({
+                    unicodedata.normalize('NFC', res.get('metadata_storage_name') or '') for res in search_results
+                })
                 
-                # Check for missing files
-                for target_file in available_files:
-                    # We check if the target file is "represented" in the results
+                def is_represented(target_file):
                     # The result filename might have (p.N) suffix or be exact match
-                    is_found = False
-                    for found in found_filenames:
-                        if found.startswith(target_file):
-                            is_found = True
-                            break
-                    
-                    if not is_found:
-                        print(f"DEBUG: Selected file '{target_file}' missing from results. Force fetching...")
-                        # Force fetch top chunks for this file
-                        safe_target = target_file.replace("'", "''")
-                        
-                        # Use a broad search for this file to get relevant chunks if possible, 
-                        # otherwise just get any chunks (using *)
-                        # We try to use the original query first restricted to this file
-                        force_query = search_query if search_query and search_query != "*" else "*"
-                        
-                        forced_results = self.search_manager.search(
-                            force_query,
-                            filter_expr=f"startswith(metadata_storage_name, '{safe_target}')",
-                            use_semantic_ranker=False, # Speed up
-                            search_mode=search_mode
+                    target = unicodedata.normalize('NFC', target_file)
+                    i = bisect.bisect_left(found_sorted, target)
+                    return i < len(found_sorted) and found_sorted[i].startswith(target)
+                
+                # Check for missing files
+                missing_files = [target_file for target_file in available_files if not is_represented(target_file)]
+                
+                if missing_files:
+                    # Each missing file's search cascade is independent; run them concurrently and
+                    # append in selection order so the ranking stays deterministic
+                    force_query = search_query if search_query and search_query != "*" else "*"
+                    with ThreadPoolExecutor(max_workers=min(8, len(missing_files))) as executor:
+                        forced_per_file = executor.map(
+                            lambda target_file: self._force_fetch_file(target_file, force_query, search_mode, user_folder),
+                            missing_files
                         )
-                        
-                        # If query yielded nothing for this file, just get the first few pages (Introduction/Summary)
-                        if not forced_results:
-                             forced_results = self.search_manager.search(
-                                "*",
-                                filter_expr=f"startswith(metadata_storage_name, '{safe_target}')",
-                                use_semantic_ranker=False,
-                                search_mode="all"
-                            )
-                        
-                        # Take top 3 chunks from this file to ensure it's represented
-                        if forced_results:
-                            print(f"DEBUG: Force fetched {len(forced_results[:3])} chunks for '{target_file}'")
-                            search_results.extend(forced_results[:3])
+                        for target_file, forced_results in zip(missing_files, forced_per_file):
+                            if forced_results:
+                                print(f"DEBUG: Force fetched {len(forced_results)} chunks for '{target_file}'")
+                                search_results.extend(forced_results)
 
             # 5. Page-Aware Context Grouping
             # Group chunks by (Filename, Page)
@@ -387,15 +433,14 @@ Convert the user's natural language question into a keyword-based search query.
                 docs_map[fname].sort(key=lambda x: page_ranks[x])
             
             # Interleave keys: Doc1_BestPage, Doc2_BestPage, Doc3_BestPage, Doc1_2ndBest, ...
-            sorted_keys = []
-            max_pages_per_doc = max(len(p) for p in docs_map.values()) if docs_map else 0
-            
+            # zip_longest pads exhausted documents with None; keys are (filename, page) tuples, never None
             sorted_filenames = sorted(docs_map.keys())
-            
-            for i in range(max_pages_per_doc):
-                for fname in sorted_filenames:
-                    if i < len(docs_map[fname]):
-                        sorted_keys.append(docs_map[fname][i])
+            sorted_keys = [
+                key
+                for row in itertools.zip_longest(*(docs_map[fname] for fname in sorted_filenames))
+                for key in row
+                if key is not None
+            ]
             
             # Limit total pages
             # Increased to 20 to allow for more context when comparing multiple documents
@@ -425,19 +470,18 @@ Convert the user's natural language question into a keyword-based search query.
             context = "\n" + "="*50 + "\n".join(context_parts) if context_parts else "(No new documents found. Use conversation history.)"
             
             # 6. Build Prompt
-            full_prompt = f"""{self.system_prompt}
-
-CONTEXT:
+            # The static system prompt leads as its own message instead of being concatenated per call
+            user_content = f"""CONTEXT:
 {context}
 
 USER QUESTION:
 {user_message}"""
             
-            messages = []
+            messages = [self._system_message]
             if conversation_history:
                 history = [msg for msg in conversation_history if msg['role'] != 'system']
                 messages.extend(history)
-            messages.append({"role": "user", "content": full_prompt})
+            messages.append({"role": "user", "content": user_content})
             
             # 7. Call LLM
             try:
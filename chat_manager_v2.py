@@ -1,8 +1,100 @@
 import os
 from openai import AzureOpenAI
 from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import lru_cache
+import hashlib
+import json
+import re
+import time
+import unicodedata
 import urllib.parse
+from urllib.parse import unquote
+
+# Shared read-only SAS permission (avoids rebuilding it for every citation link)
+_READ_PERMISSION = BlobSasPermissions(read=True)
+
+# Fields the RAG pipeline actually reads from search results (content/title feed the prompt, name/path/title the citations)
+CHAT_SELECT_FIELDS = ["metadata_storage_name", "metadata_storage_path", "content", "title"]
+
+# Signed citation URLs are valid for 1h; a memoized URL is reused for at most 10 minutes,
+# so every link handed out still has at least 50 minutes left
+SAS_URL_REUSE_SECONDS = 10 * 60
+
+# Completed answers are reused for identical requests; citation links are re-signed on every hit
+RESPONSE_CACHE_TTL_SECONDS = 30 * 60
+RESPONSE_CACHE_MAX_ENTRIES = 256
+
+# Patterns used per request / per search result, compiled once
+_EXPLICIT_PAGE_PATTERNS = [
+    re.compile(r'(\d+)\s*페이지', re.IGNORECASE),  # "7페이지"
+    re.compile(r'p\.?\s*(\d+)', re.IGNORECASE),  # "p.7" or "p7" or "p. 7"
+    re.compile(r'page\s*(\d+)', re.IGNORECASE),  # "page 7"
+]
+_LUCENE_SPECIAL_RE = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\])')
+_PAGE_ANCHOR_RE = re.compile(r'#page=(\d+)')
+_NAME_PAGE_SUFFIX_RE = re.compile(r'\(p\.(\d+)\)')
+_TRAILING_PAGE_SUFFIX_RE = re.compile(r'\s*\(p\.\d+\)$')
+
+# Question normalization for the answer/rewrite caches: case, punctuation and spacing differences
+# ("Load List please?" vs "load list please") map to one key; '-', '.', '/' stay (tag numbers, p.N)
+_QUESTION_NOISE_RE = re.compile(r"[^\w\s\-./]+")
+
+def normalize_question(text):
+    return " ".join(_QUESTION_NOISE_RE.sub(" ", unicodedata.normalize('NFC', text).casefold()).split())
+
+def _apply_user_folder_filter(results, user_folder):
+    """
+    Keep only results whose (decoded) storage path lies in user_folder; no folder -> unchanged
+    """
+    if not user_folder or not results:
+        return results
+    return [doc for doc in results if user_folder in unquote(doc.get('metadata_storage_path') or '')]
+
+# Known EPC intents -> keyword expansions; a matching question is expanded without an LLM round-trip
+_INTENT_RULES = [
+    (re.compile(r'전기\s*부하\s*리스트|load\s*list', re.IGNORECASE), "Electrical Load List Motor Heater kW HP Tag No Rating"),
+    (re.compile(r'장비\s*(리스트|목록)|equipment\s*list', re.IGNORECASE), "Equipment List Pump Vessel Exchanger Compressor Tag No"),
+    (re.compile(r'라인\s*(리스트|목록)|line\s*list', re.IGNORECASE), "Line List Line No Size Service Fluid Spec"),
+    (re.compile(r'계기\s*(리스트|목록)|instrument\s*(index|list)', re.IGNORECASE), "Instrument Index Tag No PT TT FT LT Service"),
+    (re.compile(r'\bBOM\b|bill\s*of\s*materials?|자재\s*명세', re.IGNORECASE), "Bill of Materials BOM Item Qty Material Description"),
+    (re.compile(r'\bMTO\b|material\s*take[\s-]*off|물량', re.IGNORECASE), "Material Take Off MTO Qty Size Material"),
+    (re.compile(r'\bGA\b|general\s*arrangement|배치도', re.IGNORECASE), "General Arrangement GA Plan Elevation Dimension"),
+    (re.compile(r'치수|dimension', re.IGNORECASE), "Dimension Elevation EL Length Width Height mm"),
+    (re.compile(r'데이터\s*시트|data\s*sheet|사양|\bspec(ification)?s?\b', re.IGNORECASE), "Data Sheet Specification Design Pressure Temperature Material"),
+    (re.compile(r'설계\s*(압력|온도)|design\s*(pressure|temperature)', re.IGNORECASE), "Design Pressure Design Temperature Operating barg °C"),
+    (re.compile(r'밸브|valve', re.IGNORECASE), "Valve Size Rating Class Type Tag No"),
+    (re.compile(r'배관|piping|\bpipe\b', re.IGNORECASE), "Piping Pipe Size Schedule Class Spec"),
+    (re.compile(r'펌프|\bpump', re.IGNORECASE), "Pump Capacity Head Flow Motor kW Tag No"),
+    (re.compile(r'열교환기|exchanger', re.IGNORECASE), "Heat Exchanger Duty Shell Tube Design Pressure"),
+    (re.compile(r'압축기|compressor', re.IGNORECASE), "Compressor Capacity Suction Discharge Pressure Motor"),
+    (re.compile(r'모터|전동기|\bmotor', re.IGNORECASE), "Motor kW HP Voltage Rating Tag No"),
+    (re.compile(r'케이블|cable', re.IGNORECASE), "Cable Size Core Length Schedule From To"),
+    (re.compile(r'접지|grounding|earthing', re.IGNORECASE), "Grounding Earthing Ground Rod Conductor mm2"),
+    (re.compile(r'단선도|single\s*line|\bSLD\b', re.IGNORECASE), "Single Line Diagram SLD Bus Breaker Transformer kV"),
+    (re.compile(r'변압기|transformer', re.IGNORECASE), "Transformer kVA MVA Voltage Ratio Impedance"),
+]
+
+# Unmatched questions at or below this many tokens are searched as-is (a rewrite rarely helps short queries)
+LLM_REWRITE_MIN_TOKENS = 7
+
+QUERY_REWRITE_PROMPT = """You are a search query optimizer for technical documents.
+Convert the user's natural language question into a keyword-based search query.
+- Remove conversational filler (e.g., "Please find", "Can you tell me").
+- Add relevant technical synonyms (e.g., "Load List" -> "Load List Motor Heater kW").
+- Keep specific Tag Numbers (e.g., 10-P-101).
+- Output ONLY the search query.
+"""
+
+HYDE_PROMPT = """You are an EPC engineering document writer.
+Write a short passage (2-3 sentences) as it would appear in a drawing, data sheet or specification that answers the user's question.
+- Use the technical terms, units and tag formats such documents use.
+- Output ONLY the passage.
+"""
+
+# Reciprocal Rank Fusion constant: score(doc) = sum over variant lists of 1 / (RRF_K + rank)
+RRF_K = 60
 
 class AzureOpenAIChatManager:
     def __init__(self, endpoint, api_key, deployment_name, api_version, 
@@ -17,10 +109,32 @@ class AzureOpenAIChatManager:
         )
         print("DEBUG: chat_manager_v2.py loaded (Version: V2 Rename Fix)")
         self.deployment_name = deployment_name
+        # o1 models and gpt-5 preview use max_completion_tokens; the choice is fixed per deployment
+        self._high_capacity_model = any(x in deployment_name.lower() for x in ["o1", "gpt-5", "5.2"])
+        if self._high_capacity_model:
+            self._completion_params = {"max_completion_tokens": 32000}  # Increased limit for Pro models
+        else:
+            self._completion_params = {"max_tokens": 4096, "temperature": 0.3}  # Increased standard limit
         self.search_manager = search_manager
         self.storage_connection_string = storage_connection_string
         self.container_name = container_name
         
+        # Parse the connection string once; every citation link is signed with the same account key
+        self._blob_service_client = BlobServiceClient.from_connection_string(storage_connection_string)
+        self._account_name = self._blob_service_client.account_name
+        # Memoized per (blob, disposition, time bucket) for the lifetime of the process-shared manager
+        self._signed_blob_url = lru_cache(maxsize=1024)(self._sign_blob_url)
+        # Key: SHA-256 of the full request, Value: (stored_at, unlinked answer parts, citations_map, result tail)
+        self._response_cache = {}
+        # Key: normalized question, Value: LLM query rewrite (temperature 0.1, effectively stable).
+        # The app keeps one manager per process, so rewrites survive reruns and are shared across sessions
+        self._rewrite_cache = {}
+        # Key: normalized question, Value: HyDE pseudo-passage used as an extra search variant (process-wide, like rewrites)
+        self._hyde_cache = {}
+        # Key: tuple of selected files, Value: (single-pass filename matcher, {lowercase pattern: (priority, filename)})
+        # built once per selection and kept on the process-shared manager, so it is reused across turns and reruns
+        self._filename_cache = {}
+        
     # System prompt optimized for technical accuracy and table interpretation
         self.system_prompt = """You are an expert EPC (Engineering, Procurement, and Construction) project assistant with deep knowledge in interpreting technical drawings and documents.
 Use the provided CONTEXT to answer the user's question.
@@ -99,22 +213,34 @@ You must interpret the provided text as if you are looking at an engineering dia
 
 7. **Language**: Respond in Korean unless asked otherwise.
 """
+        # Immutable; built once per process-shared manager and reused as the leading system message of every request
+        self._system_message = {"role": "system", "content": self.system_prompt}
+
+    def _sign_blob_url(self, blob_name, inline, time_bucket):
+        """
+        Build a read-only SAS URL (memoized per blob; time_bucket only rotates the memo key)
+        """
+        extra = {"content_disposition": "inline", "content_type": "application/pdf"} if inline else {}
+        sas_token = generate_blob_sas(
+            account_name=self._account_name,
+            container_name=self.container_name,
+            blob_name=blob_name,
+            # Resolved per call: SAS/AAD connection strings have no account key, which should only fail
+            # link signing (callers return "#"/None), not the whole chat manager
+            account_key=self._blob_service_client.credential.account_key,
+            permission=_READ_PERMISSION,
+            expiry=datetime.utcnow() + timedelta(hours=1),
+            **extra
+        )
+        # The blob_name passed to generate_blob_sas must be the raw name; the one in the URL must be encoded
+        return f"https://{self._account_name}.blob.core.windows.net/{self.container_name}/{urllib.parse.quote(blob_name)}?{sas_token}"
 
     def generate_sas_url(self, blob_name):
         """
         Generate a SAS URL for a specific blob
         """
         try:
-            blob_service_client = BlobServiceClient.from_connection_string(self.storage_connection_string)
-            sas_token = generate_blob_sas(
-                account_name=blob_service_client.account_name,
-                container_name=self.container_name,
-                blob_name=blob_name,
-                account_key=blob_service_client.credential.account_key,
-                permission=BlobSasPermissions(read=True),
-                expiry=datetime.utcnow() + timedelta(hours=1)
-            )
-            return f"https://{blob_service_client.account_name}.blob.core.windows.net/{self.container_name}/{urllib.parse.quote(blob_name)}?{sas_token}"
+            return self._signed_blob_url(blob_name, False, int(time.time() // SAS_URL_REUSE_SECONDS))
         except Exception as e:
             print(f"Error generating SAS URL: {e}")
             return "#"
@@ -134,31 +260,37 @@ You must interpret the provided text as if you are looking at an engineering dia
         
         # Sort files by length (descending) to match longest filename first
         # e.g. "Drawing_RevA.pdf" vs "Drawing.pdf"
-        sorted_files = sorted(available_files, key=len, reverse=True)
+        scope_key = tuple(available_files)
+        cached = self._filename_cache.get(scope_key)
+        if cached is None:
+            # Every name (and name without extension, if user didn't say it) becomes one alternative in
+            # priority order, so a single scan of the message replaces one substring search per file
+            owners = {}
+            for priority, filename in enumerate(sorted(available_files, key=len, reverse=True)):
+                owners.setdefault(filename.lower(), (priority, filename))
+                owners.setdefault(os.path.splitext(filename)[0].lower(), (priority, filename))
+            patterns = sorted(owners, key=lambda pattern: owners[pattern][0])
+            # Zero-width lookahead reports a match at every position, not just non-overlapping ones
+            matcher = re.compile("(?=(" + "|".join(map(re.escape, patterns)) + "))")
+            cached = (matcher, owners)
+            if len(self._filename_cache) >= RESPONSE_CACHE_MAX_ENTRIES:
+                self._filename_cache.pop(next(iter(self._filename_cache)), None)
+            self._filename_cache[scope_key] = cached
         
-        for filename in sorted_files:
-            # Remove extension for matching if user didn't say it
-            name_no_ext = os.path.splitext(filename)[0].lower()
-            filename_lower = filename.lower()
-            
-            if filename_lower in msg_lower or name_no_ext in msg_lower:
-                matched_file = filename
-                break
+        matcher, owners = cached
+        matches = [owners[match.group(1)] for match in matcher.finditer(msg_lower)]
+        if matches:
+            matched_file = min(matches)[1]
         
         if matched_file:
             print(f"DEBUG: Detected filename in query: {matched_file}")
-            import unicodedata
             # Ensure NFC normalization for consistent matching with indexed data
             matched_file = unicodedata.normalize('NFC', matched_file)
             # Escape single quotes for OData
             safe_filename = matched_file.replace("'", "''")
             # Escape special characters for Lucene/Simple query syntax
             # Special chars: + - && || ! ( ) { } [ ] ^ " ~ * ? : \ /
-            import re
-            escaped_filename = re.sub(r'([+\-&|!(){}\[\]^"~*?:\\])', r'\\\1', safe_filename)
-            
-            import re
-            escaped_filename = re.sub(r'([+\-&|!(){}\[\]^"~*?:\\])', r'\\\1', safe_filename)
+            escaped_filename = _LUCENE_SPECIAL_RE.sub(r'\\\1', safe_filename)
             # Use search.ismatch for exact filename matching (more reliable for SearchableFields)
             # We match the phrase because the indexed name might be "filename (p.N)"
             return f"search.ismatch('\"{escaped_filename}\"', 'metadata_storage_name')"
@@ -169,14 +301,28 @@ You must interpret the provided text as if you are looking at an engineering dia
         """
         Rewrite user query to be search-friendly using LLM
         """
-        import re
-        
         # Skip rewriting for page-specific queries (preserve exact page number)
         if re.search(r'(\d+)\s*페이지|p\.?\s*\d+|page\s*\d+', user_message, re.IGNORECASE):
             print("DEBUG: Skipping query rewriting (page-specific query)")
             return user_message
         
-        # Skip rewriting for structural/title queries (preserve exact keywords)
+        # Simple rule-based first for speed: every matching known intent contributes its keywords.
+        # Runs before the structural skip because most known intents are list/index/drawing questions;
+        # the original wording is kept and only keywords are appended.
+        expansions = [expansion for pattern, expansion in _INTENT_RULES if pattern.search(user_message)]
+        if expansions:
+            expanded = f"{user_message} {' '.join(expansions)}"
+            print(f"DEBUG: Rule-based query expansion: '{user_message}' -> '{expanded}'")
+            return expanded
+        
+        # Rule for P&ID List
+        if any(x in user_message.upper() for x in ["P&ID", "PID", "피앤아이디"]) and any(x in user_message for x in ["리스트", "목록", "LIST", "INDEX", "비교"]):
+            # Expanded to include exact title from user screenshot
+            expanded = f"{user_message} PIPING AND INSTRUMENT DIAGRAM LIST DRAWING INDEX TABLE PIPING AND INSTRUMENT DIAGRAM FOR LIST"
+            print(f"DEBUG: Query expansion triggered for P&ID List: '{user_message}' -> '{expanded}'")
+            return expanded
+        
+        # Skip rewriting for other structural/title queries (preserve exact keywords)
         structural_keywords = ['LIST', 'INDEX', 'TABLE', 'DIAGRAM', '목록', '리스트', '다이어그램', '도면']
         if any(kw in user_message.upper() for kw in structural_keywords):
             print("DEBUG: Skipping query rewriting (structural/title query)")
@@ -184,48 +330,85 @@ You must interpret the provided text as if you are looking at an engineering dia
         
         # Otherwise, proceed with LLM-based query rewriting
         try:
-            # Simple rule-based first for speed
-            # If it's a "Load List" request, add specific keywords
-            if "전기부하리스트" in user_message or "Load List" in user_message:
-                return f"{user_message} Electrical Load List Motor Heater kW HP Tag No Rating"
-            
-            # Rule for P&ID List
-            if any(x in user_message.upper() for x in ["P&ID", "PID", "피앤아이디"]) and any(x in user_message for x in ["리스트", "목록", "LIST", "INDEX", "비교"]):
-                # Expanded to include exact title from user screenshot
-                expanded = f"{user_message} PIPING AND INSTRUMENT DIAGRAM LIST DRAWING INDEX TABLE PIPING AND INSTRUMENT DIAGRAM FOR LIST"
-                print(f"DEBUG: Query expansion triggered for P&ID List: '{user_message}' -> '{expanded}'")
-                return expanded
-            
-            # Use LLM for complex rewriting
-            system_prompt = """You are a search query optimizer for technical documents.
-Convert the user's natural language question into a keyword-based search query.
-- Remove conversational filler (e.g., "Please find", "Can you tell me").
-- Add relevant technical synonyms (e.g., "Load List" -> "Load List Motor Heater kW").
-- Keep specific Tag Numbers (e.g., 10-P-101).
-- Output ONLY the search query.
-"""
+            if len(user_message.split()) < LLM_REWRITE_MIN_TOKENS:
+                print("DEBUG: Skipping LLM query rewriting (short query, no known intent)")
+                return user_message
+            
+            # Use LLM for complex rewriting (reused for questions that normalize to the same text)
+            rewrite_key = normalize_question(user_message)
+            if rewrite_key in self._rewrite_cache:
+                print("DEBUG: Query rewrite cache hit")
+                return self._rewrite_cache[rewrite_key]
             response = self.client.chat.completions.create(
                 model=self.deployment_name,
                 messages=[
-                    {"role": "system", "content": system_prompt},
+                    {"role": "system", "content": QUERY_REWRITE_PROMPT},
                     {"role": "user", "content": user_message}
                 ],
                 max_tokens=100,
                 temperature=0.1
             )
             rewritten = response.choices[0].message.content.strip()
+            if not rewritten:
+                return user_message
+            if len(self._rewrite_cache) >= RESPONSE_CACHE_MAX_ENTRIES:
+                self._rewrite_cache.pop(next(iter(self._rewrite_cache)), None)
+            self._rewrite_cache[rewrite_key] = rewritten
+            return rewritten
         except Exception as e:
             print(f"DEBUG: Query rewriting failed: {e}")
             return user_message
 
+    def _hyde_passage(self, user_message):
+        """
+        Generate a hypothetical document passage for the question (HyDE); None if unavailable
+        """
+        hyde_key = normalize_question(user_message)
+        if hyde_key in self._hyde_cache:
+            return self._hyde_cache[hyde_key]
+        try:
+            response = self.client.chat.completions.create(
+                model=self.deployment_name,
+                messages=[
+                    {"role": "system", "content": HYDE_PROMPT},
+                    {"role": "user", "content": user_message}
+                ],
+                max_tokens=150,
+                temperature=0.1
+            )
+            passage = (response.choices[0].message.content or "").strip()
+        except Exception as e:
+            print(f"DEBUG: HyDE generation failed: {e}")
+            return None
+        # Lucene operators in free text would change the query meaning
+        passage = _LUCENE_SPECIAL_RE.sub(' ', passage) or None
+        if len(self._hyde_cache) >= RESPONSE_CACHE_MAX_ENTRIES:
+            self._hyde_cache.pop(next(iter(self._hyde_cache)), None)
+        self._hyde_cache[hyde_key] = passage
+        return passage
+
+    def _generate_query_variants(self, user_message, sanitized_query):
+        """
+        Build the Stage 2 query variants: raw question, rule/LLM-expanded keywords and,
+        for longer free-form questions, a HyDE passage. The LLM calls run concurrently.
+        """
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            rewrite_future = executor.submit(self._rewrite_query, user_message)
+            hyde_future = None
+            if len(user_message.split()) >= LLM_REWRITE_MIN_TOKENS:
+                hyde_future = executor.submit(self._hyde_passage, user_message)
+            variants = [sanitized_query, rewrite_future.result()]
+            if hyde_future is not None:
+                variants.append(hyde_future.result())
+        # Drop empty and duplicate variants (e.g. a rewrite that returned the question unchanged)
+        return [v for v in dict.fromkeys(variants) if v]
+
     def _clean_content(self, text):
         """
         Clean indexed content by removing XML tags and OCR noise
         """
         if not text:
             return ""
-            
-        import re
         
         # 1. Remove XML comments
         text = re.sub(r'<!--.*?-->', '', text, flags=re.DOTALL)
@@ -282,8 +465,7 @@ Convert the user's natural language question into a keyword-based search query.
         Fetch analysis JSON directly from Blob Storage to bypass AI Search
         """
         try:
-            blob_service_client = BlobServiceClient.from_connection_string(self.storage_connection_string)
-            container_client = blob_service_client.get_container_client(self.container_name)
+            container_client = self._blob_service_client.get_container_client(self.container_name)
             
             # Construct JSON path
             # We assume the JSON is stored in 'json/' folder with the same name + .json
@@ -305,7 +487,6 @@ Convert the user's natural language question into a keyword-based search query.
                     print(f"DEBUG: Direct JSON fetch failed - blob not found: {json_blob_name}")
                     return []
 
-            import json
             data = json.loads(blob_client.download_blob().readall())
             
             # Convert JSON chunks to search-result-like objects
@@ -331,22 +512,40 @@ Convert the user's natural language question into a keyword-based search query.
             print(f"DEBUG: Direct JSON fetch error for {filename}: {e}")
             return []
 
-    def get_chat_response(self, user_message, conversation_history=None, search_mode="any", use_semantic_ranker=False, filter_expr=None, available_files=None, user_folder=None, is_admin=False):
+    def get_chat_response(self, user_message, conversation_history=None, search_mode="any", use_semantic_ranker=False, filter_expr=None, available_files=None, user_folder=None, is_admin=False, select_fields=None, on_token=None, highlight=False):
         """
         Get chat response with client-side RAG
+        select_fields: index fields to retrieve (defaults to CHAT_SELECT_FIELDS)
+        highlight: request '@search.highlights' snippets (only for callers that display them)
+        on_token: optional callback; when given, the completion is streamed and each text delta is passed to it
+                  as it arrives (the returned tuple is unchanged)
         """
+        if select_fields is None:
+            select_fields = CHAT_SELECT_FIELDS
+        
+        # Identical request (same prompt, history, scope and user) -> reuse the completed answer.
+        # A first-turn question is keyed by its normalized form so trivially different phrasings share an answer;
+        # follow-up turns keep the exact text because the history already makes them specific.
+        cache_question = user_message if conversation_history else normalize_question(user_message)
+        cache_key = hashlib.sha256(json.dumps(
+            [self.system_prompt, conversation_history or [], cache_question, search_mode, use_semantic_ranker,
+             filter_expr, available_files or [], user_folder, is_admin, select_fields, highlight],
+            ensure_ascii=False, default=str
+        ).encode('utf-8')).hexdigest()
+        cached = self._response_cache.get(cache_key)
+        if cached and time.time() - cached[0] < RESPONSE_CACHE_TTL_SECONDS:
+            print("DEBUG: Response cache hit")
+            _stored_at, (answer_text, debug_info), citations_map, (citations, context, final_filter, search_results) = cached
+            # Links are signed now rather than served from the stored answer, so they never outlive their SAS
+            response_text = self._linkify_citations(answer_text, citations, citations_map)
+            return response_text + debug_info, citations, context, final_filter, search_results
+        
         try:
             # 0. Extract explicit page number from query
             # This allows users to request specific pages like "7페이지", "p.10", "page 7"
-            import re
             explicit_page = None
-            page_patterns = [
-                r'(\d+)\s*페이지',  # "7페이지"
-                r'p\.?\s*(\d+)',  # "p.7" or "p7" or "p. 7"
-                r'page\s*(\d+)',  # "page 7"
-            ]
-            for pattern in page_patterns:
-                match = re.search(pattern, user_message, re.IGNORECASE)
+            for pattern in _EXPLICIT_PAGE_PATTERNS:
+                match = pattern.search(user_message)
                 if match:
                     explicit_page = int(match.group(1))
                     print(f"DEBUG: Detected explicit page request: {explicit_page}")
@@ -357,28 +556,32 @@ Convert the user's natural language question into a keyword-based search query.
             # 0. Construct Scope Filter from available_files (if provided, treat as selected files)
             # This ensures we ONLY search within the files the user has selected in the UI
             scope_filter = None
-            import unicodedata
             
             if available_files:
                  # Normalize filenames to NFC to match index
                  normalized_files = [unicodedata.normalize('NFC', f) for f in available_files]
                  
-                 # Use startswith for exact filename matching (more reliable than search.ismatch for filenames with special chars)
-                 # We match the prefix because the indexed name might be "filename (p.N)"
-                 conditions = []
-                 for f in normalized_files:
-                     # Escape single quotes for OData filter
-                     safe_f = f.replace("'", "''")
-                     import re
-                     escaped_f = re.sub(r'([+\-&|!(){}\[\]^"~*?:\\])', r'\\\1', safe_f)
-                     # Use search.ismatch for exact filename matching (more reliable for SearchableFields)
-                     # CRITICAL FIX: Restore double quotes for exact phrase match (like Debug Tool)
-                     conditions.append(f"search.ismatch('\"{escaped_f}\"', 'metadata_storage_name')")
-                 
-                 if conditions:
-                    scope_filter = f"({' or '.join(conditions)})"
-                    print(f"DEBUG: Scope filter (Selected files): {len(normalized_files)} files")
-                    # print(f"DEBUG: Scope filter string: {scope_filter}")
+                 # Exact set membership (search.in) instead of one phrase match per file:
+                 # page docs carry the base name in 'filename' (their name is "filename (p.N)"),
+                 # whole-file docs from the blob indexer match on metadata_storage_name itself.
+                 # Both NFC and NFD spellings are listed because indexer-stored names may be NFD.
+                 scope_names = dict.fromkeys(
+                     form for f in normalized_files for form in (f, unicodedata.normalize('NFD', f))
+                 )
+                 # '|' delimiter because filenames may contain commas; quotes doubled for OData
+                 name_list = "|".join(scope_names).replace("'", "''")
+                 # Legacy/renamed page docs have no 'filename' and are named "x.pdf (p.N)", so neither
+                 # search.in matches them; they are reached by a phrase match on the name instead
+                 phrases = [name.replace('"', '\\"').replace("'", "''") for name in scope_names]
+                 legacy_matches = " or ".join(
+                     f"search.ismatch('\"{phrase}\"', 'metadata_storage_name')" for phrase in phrases
+                 )
+                 scope_filter = (
+                     f"(search.in(filename, '{name_list}', '|') or "
+                     f"search.in(metadata_storage_name, '{name_list}', '|') or "
+                     f"(filename eq null and ({legacy_matches})))"
+                 )
+                 print(f"DEBUG: Scope filter (Selected files): {len(normalized_files)} files")
             else:
                 print("DEBUG: No available_files passed (or empty list)")
 
@@ -403,13 +606,14 @@ Convert the user's natural language question into a keyword-based search query.
             print(f"DEBUG: Final OData Filter: {final_filter}")
 
             # 1.5 DIRECT CONTEXT RETRIEVAL (Bypass Search for Selected Files)
-            direct_results = []
+            # The JSON downloads are independent of the search below, so they run in the background
+            # while Stage 1/2 execute and are collected only when the results are combined.
+            direct_fetch = None
             if available_files:
                 print(f"DEBUG: Using Direct Context Retrieval for {len(available_files)} files")
-                for f in available_files:
-                    f_results = self._get_direct_context_from_json(f, user_folder)
-                    if f_results:
-                        direct_results.extend(f_results)
+                direct_executor = ThreadPoolExecutor(max_workers=min(8, len(available_files)))
+                direct_fetch = direct_executor.map(lambda f: self._get_direct_context_from_json(f, user_folder), available_files)
+                direct_executor.shutdown(wait=False)
             
             # If we have direct results, we can either skip search or combine them.
             # For "도면/스펙 비교" tab, we usually want EXACTLY these files.
@@ -434,7 +638,6 @@ Convert the user's natural language question into a keyword-based search query.
             
             # SANITIZE QUERY: Remove "AND", "&", and special chars to avoid syntax issues
             # We want to match "PIPING", "INSTRUMENT", "DIAGRAM", "LIST" regardless of "AND" or "&"
-            import re
             
             # CRITICAL: Match app.py logic exactly (No stopword removal)
             # The Debug Tool uses the raw query (sanitized), so we should too.
@@ -452,7 +655,9 @@ Convert the user's natural language question into a keyword-based search query.
                 filter_expr=final_filter,
                 use_semantic_ranker=False,  # FORCE FALSE for exact match stage
                 search_mode="all",  # FORCE ALL (AND logic) - all terms must be present
-                top=50  # Get enough to find exact matches
+                top=50,  # Get enough to find exact matches
+                select=select_fields,
+                highlight=highlight
             )
             
             if exact_results:
@@ -472,15 +677,33 @@ Convert the user's natural language question into a keyword-based search query.
             
             if exact_match_count < EXACT_MATCH_THRESHOLD:
                 print(f"DEBUG: [Stage 2] Expanding query (only {exact_match_count} exact matches)...")
-                search_query = self._rewrite_query(user_message)
-                print(f"DEBUG: [Stage 2] Expanded query: '{search_query}'")
+                query_variants = self._generate_query_variants(user_message, sanitized_query)
+                search_query = " | ".join(query_variants)
+                for variant in query_variants:
+                    print(f"DEBUG: [Stage 2] Query variant: '{variant}'")
                 
-                expanded_results = self.search_manager.search(
-                    search_query,
-                    filter_expr=final_filter,
-                    use_semantic_ranker=use_semantic_ranker,
-                    search_mode=search_mode
-                )
+                with ThreadPoolExecutor(max_workers=len(query_variants)) as executor:
+                    variant_results = list(executor.map(
+                        lambda q: self.search_manager.search(
+                            q,
+                            filter_expr=final_filter,
+                            use_semantic_ranker=use_semantic_ranker,
+                            search_mode=search_mode,
+                            select=select_fields,
+                            highlight=highlight
+                        ) or [],
+                        query_variants
+                    ))
+                
+                # Reciprocal Rank Fusion: documents found by several variants rise to the top
+                fused_scores = {}
+                fused_docs = {}
+                for results in variant_results:
+                    for rank, result in enumerate(results, 1):
+                        result_id = result.get('metadata_storage_name', '') + str(result.get('content', '')[:50])
+                        fused_scores[result_id] = fused_scores.get(result_id, 0.0) + 1.0 / (RRF_K + rank)
+                        fused_docs.setdefault(result_id, result)
+                expanded_results = [fused_docs[result_id] for result_id in sorted(fused_scores, key=fused_scores.get, reverse=True)]
                 
                 if expanded_results:
                     print(f"DEBUG: [Stage 2] Found {len(expanded_results)} additional results")
@@ -508,6 +731,7 @@ Convert the user's natural language question into a keyword-based search query.
             print(f"DEBUG: ===== TWO-STAGE SEARCH COMPLETE =====\n")
             
             # Combine with direct results (avoid duplicates)
+            direct_results = [res for f_results in direct_fetch for res in f_results] if direct_fetch else []
             if direct_results:
                 # Add direct results that aren't already in search_results
                 existing_paths = {res.get('metadata_storage_path') for res in search_results}
@@ -521,12 +745,8 @@ Convert the user's natural language question into a keyword-based search query.
             # Filter by user_folder (Python-side enforcement)
             # CRITICAL: Admin can see all files, so we skip this filter if is_admin is True
             if user_folder and search_results and not is_admin:
-                from urllib.parse import unquote
                 original_count = len(search_results)
-                filtered_results = [
-                    doc for doc in search_results 
-                    if user_folder in unquote(doc.get('metadata_storage_path', ''))
-                ]
+                filtered_results = _apply_user_folder_filter(search_results, user_folder)
                 if filtered_results:
                     search_results = filtered_results
                     print(f"DEBUG: User folder filter: {original_count} -> {len(search_results)}")
@@ -543,28 +763,14 @@ Convert the user's natural language question into a keyword-based search query.
                 print(f"DEBUG: Top 10 search results pages:")
                 for i, res in enumerate(search_results[:10]):
                     print(f"  {i+1}. {res.get('metadata_storage_name', 'Unknown')}")
-            
-            # Fallback 1: REMOVED
-            # If specific file search fails, we do NOT retry globally.
-            pass
-
-            # Fallback 2: REMOVED
-            # If search fails, do NOT fetch the whole file. It confuses the LLM.
-            pass
-                
 
 
-            # 4. Force Inclusion of Selected Files - REMOVED
-            # We rely purely on the search engine ranking.
-            pass
-
             # ============================================================
             # KEYWORD COUNT RERANKING (Client-Side)
             # ============================================================
             # The user requested to prioritize pages with the most keyword matches.
             # We ignore the search engine's score and sort by keyword frequency.
             
-            import re
             # Extract keywords (simple whitespace split + alphanumeric check)
             query_keywords = [kw for kw in user_message.upper().split() if len(kw) > 1]
             
@@ -600,27 +806,23 @@ Convert the user's natural language question into a keyword-based search query.
                 
                 # Extract page number
                 page = None
-                import re
-                from urllib.parse import unquote
                 
                 filename = unquote(filename)
                 
                 # Try to get page from path first
                 if path:
-                    page_match = re.search(r'#page=(\d+)', path)
+                    page_match = _PAGE_ANCHOR_RE.search(path)
                     if page_match:
                         page = int(page_match.group(1))
                 
                 # If not in path, try to extract from filename (e.g. "file.pdf (p.7)")
                 if page is None:
-                    page_match = re.search(r'\(p\.(\d+)\)', filename)
+                    page_match = _NAME_PAGE_SUFFIX_RE.search(filename)
                     if page_match:
                         page = int(page_match.group(1))
                         # Clean filename by removing the suffix
                         filename = filename.split(' (p.')[0]
                 
-                # CRITICAL: If page is still None, this is a "rogue" document (whole file indexed without page splitting).
-                # We default to Page 1 to ensure we don't miss data.
                 # CRITICAL: If page is still None, this is a "rogue" document (whole file indexed without page splitting).
                 # We default to Page 1 to ensure we don't miss data.
                 if page is None:
@@ -629,11 +831,7 @@ Convert the user's natural language question into a keyword-based search query.
                 
                 key = (filename, page)
                 
-                # Boosting Logic - REMOVED
-                # We rely purely on the search engine ranking.
-                boost = 0
-                
-                adjusted_rank = rank + boost
+                adjusted_rank = rank
                 if key not in page_ranks:
                     page_ranks[key] = adjusted_rank
                     page_scores[key] = result.get('@keyword_score', 0)
@@ -682,8 +880,7 @@ Convert the user's natural language question into a keyword-based search query.
                         
                         # CRITICAL FIX: Strip " (p.N)" suffix if present in the path
                         # This happens if the indexer appended it to the path
-                        import re
-                        blob_path = re.sub(r'\s*\(p\.\d+\)$', '', blob_path)
+                        blob_path = _TRAILING_PAGE_SUFFIX_RE.sub('', blob_path)
                         
                     citations_map[key] = {
                         'filepath': blob_path,
@@ -699,17 +896,12 @@ Convert the user's natural language question into a keyword-based search query.
 
             # 5. Construct Context String
             context_parts = []
-            citations = []
             
             # Strategy: Simple sort by Rank
             # We rely strictly on the search engine's ranking.
             sorted_keys = sorted(grouped_context.keys(), key=lambda k: page_ranks[k])
             print(f"DEBUG: Context construction - Sorted {len(sorted_keys)} pages by rank")
             
-            # Limit total pages
-            # Increased to 20 to allow for more context when comparing multiple documents
-            # Limit total pages
-            # Reduced to 10 to prevent token overflow (finish_reason='length')
             # Limit total pages
             # Increased to 25 to ensure we capture lists/tables that might be ranked lower
             context_limit = 25
@@ -722,11 +914,6 @@ Convert the user's natural language question into a keyword-based search query.
                 if explicit_keys:
                     print(f"DEBUG: Prioritized explicit page {explicit_page}, found {len(explicit_keys)} matching pages")
             
-            # LIST-related query logic - REMOVED
-            # We rely purely on the search engine ranking.
-            pass
-
-            
             # DEBUG: Log top 30 pages with their ranks to see if page 7 is included
             print(f"\n{'='*60}")
             print(f"DEBUG: Page Ranking (showing top 30 out of {len(sorted_keys)} total pages)")
@@ -768,16 +955,12 @@ Convert the user's natural language question into a keyword-based search query.
                     context_parts.append(f"[Document: {filename}, Page: {page}, Title: {title}]\n{page_content}\n")
                 else:
                     context_parts.append(f"[Document: {filename}, Page: {page}]\n{page_content}\n")
-                
-                # Deduplicate citations by filepath
-                # Only add if not already present (based on filepath)
-                is_duplicate = False
-                for existing in citations:
-                    if existing.get('filepath') == citations_map[key].get('filepath'):
-                        is_duplicate = True
-                        break
-                if not is_duplicate:
-                    citations.append(citations_map[key])
+            
+            # Deduplicate citations by filepath (first = best-ranked page wins, rank order preserved)
+            citations_by_path = {}
+            for key in sorted_keys[:context_limit]:
+                citations_by_path.setdefault(citations_map[key].get('filepath'), citations_map[key])
+            citations = list(citations_by_path.values())
             
             if not context_parts and not conversation_history:
                 debug_msg = ""
@@ -790,45 +973,48 @@ Convert the user's natural language question into a keyword-based search query.
             print(f"DEBUG: Context snippet: {context[:500]}...")
             
             # 6. Build Prompt
-            full_prompt = f"""{self.system_prompt}
-
-CONTEXT:
+            # The static system prompt leads as its own message so every turn shares the same prefix
+            # (eligible for the service's prompt caching); only CONTEXT and the question vary per call.
+            full_prompt = f"""CONTEXT:
 {context}
 
 USER QUESTION:
 {user_message}"""
             
-            messages = []
-            if conversation_history:
-                history = [msg for msg in conversation_history if msg['role'] != 'system']
-                messages.extend(history)
+            messages = [self._system_message]
+            messages.extend(msg for msg in conversation_history or () if msg['role'] != 'system')
             messages.append({"role": "user", "content": full_prompt})
             
             # 7. Call LLM
             try:
                 print("DEBUG: Calling Azure OpenAI...")
-                # Check model name to decide parameter
-                # o1 models and gpt-5 preview use max_completion_tokens
-                deployment_lower = self.deployment_name.lower()
-                
-                # Check for high-capacity models (o1, gpt-5, 5.2, etc.)
-                if any(x in deployment_lower for x in ["o1", "gpt-5", "5.2"]):
+                if self._high_capacity_model:
                     print(f"DEBUG: Using high-capacity model: {self.deployment_name}")
-                    response = self.client.chat.completions.create(
-                        model=self.deployment_name,
-                        messages=messages,
-                        max_completion_tokens=32000, # Increased limit for Pro models
-                    )
-                else:
-                    response = self.client.chat.completions.create(
-                        model=self.deployment_name,
-                        messages=messages,
-                        max_tokens=4096, # Increased standard limit
-                        temperature=0.3
-                    )
+                response = self.client.chat.completions.create(
+                    model=self.deployment_name,
+                    messages=messages,
+                    stream=on_token is not None,
+                    **self._completion_params
+                )
                 
-                response_text = response.choices[0].message.content
-                finish_reason = response.choices[0].finish_reason
+                if on_token is None:
+                    response_text = response.choices[0].message.content
+                    finish_reason = response.choices[0].finish_reason
+                else:
+                    # Accumulate the deltas for citation linkifying and caching at end of stream
+                    response_parts = []
+                    finish_reason = None
+                    for chunk in response:
+                        # Azure sends prompt-filter results as a chunk without choices
+                        if not chunk.choices:
+                            continue
+                        choice = chunk.choices[0]
+                        if choice.delta and choice.delta.content:
+                            response_parts.append(choice.delta.content)
+                            on_token(choice.delta.content)
+                        if choice.finish_reason:
+                            finish_reason = choice.finish_reason
+                    response_text = "".join(response_parts)
                 
                 if finish_reason == "content_filter":
                     print("DEBUG: Content filter triggered")
@@ -853,13 +1039,9 @@ USER QUESTION:
             print(f"\n{'='*60}")
             print(f"DEBUG: LLM Citations Analysis")
             print(f"{'='*60}")
-            cited_pages = []
-            import re
             # Find patterns like (Filename: p.N)
             # Updated regex to allow parentheses in filenames (non-greedy match until : p.)
-            matches = re.findall(r'\((.*?):\s*p\.\s*(\d+)\)', response_text)
-            for fname, pnum in matches:
-                cited_pages.append(int(pnum))
+            cited_pages = [int(pnum) for _fname, pnum in re.findall(r'\((.*?):\s*p\.\s*(\d+)\)', response_text)]
             
             print(f"DEBUG: LLM cited pages: {cited_pages}")
             
@@ -873,6 +1055,7 @@ USER QUESTION:
             print(f"{'='*60}\n")
 
             # 8. Post-process: Linkify Citations in Text
+            answer_text = response_text
             response_text = self._linkify_citations(response_text, citations, citations_map)
 
             # DEBUG: Add context visualization to the answer (hidden in expander)
@@ -902,9 +1085,18 @@ USER QUESTION:
             debug_info += "\n</details>"
             
             # Only add debug info for admins
-            final_response = response_text + debug_info if is_admin else response_text
-            
-            return final_response, citations, context, final_filter, search_results
+            if not is_admin:
+                debug_info = ""
+            
+            # Only normally finished answers are cached (filtered/truncated/empty replies and errors are not);
+            # the answer is stored before linkifying so a hit can sign fresh citation URLs
+            if finish_reason == "stop" and response_text:
+                if len(self._response_cache) >= RESPONSE_CACHE_MAX_ENTRIES:
+                    self._response_cache.pop(next(iter(self._response_cache)), None)
+                self._response_cache[cache_key] = (
+                    time.time(), (answer_text, debug_info), citations_map, (citations, context, final_filter, search_results)
+                )
+            return response_text + debug_info, citations, context, final_filter, search_results
 
         except Exception as e:
             print(f"Error in get_chat_response: {e}")
@@ -916,8 +1108,6 @@ USER QUESTION:
         """
         if not text or not citations:
             return text
-            
-        import re
         
         # Helper to find citation
         def find_citation(fname_text, page_text):
@@ -1016,27 +1206,8 @@ USER QUESTION:
         Generate SAS URL for blob document
         """
         try:
-            blob_service_client = BlobServiceClient.from_connection_string(
-                self.storage_connection_string
-            )
-            
-            sas_token = generate_blob_sas(
-                account_name=blob_service_client.account_name,
-                container_name=self.container_name,
-                blob_name=blob_name,
-                account_key=blob_service_client.credential.account_key,
-                permission=BlobSasPermissions(read=True),
-                expiry=datetime.utcnow() + timedelta(hours=1),
-                content_disposition="inline",
-                content_type="application/pdf"
-            )
-            
-            # CRITICAL FIX: URL encode the blob name to handle Korean characters and spaces
-            # The blob_name passed to generate_blob_sas must be the raw name.
-            # The blob_name in the URL must be encoded.
-            encoded_blob_name = urllib.parse.quote(blob_name)
-            blob_url = f"https://{blob_service_client.account_name}.blob.core.windows.net/{self.container_name}/{encoded_blob_name}?{sas_token}"
-            return blob_url
+            # Repeated citations of the same file within a conversation reuse the signed URL
+            return self._signed_blob_url(blob_name, True, int(time.time() // SAS_URL_REUSE_SECONDS))
         except Exception as e:
             print(f"Error generating SAS URL: {e}")
             return None
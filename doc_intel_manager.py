@@ -8,10 +8,15 @@ class DocumentIntelligenceManager:
         self.key = key
         self.credential = AzureKeyCredential(key)
         # Use the latest API version for v4.0 features
+        # Throttling (429) and transient 5xx responses are retried inside the SDK pipeline
         self.client = DocumentIntelligenceClient(
             endpoint=endpoint, 
             credential=self.credential,
-            api_version="2024-07-31-preview"
+            api_version="2024-07-31-preview",
+            retry_total=3,
+            retry_mode="exponential",
+            retry_backoff_factor=1.5,
+            retry_backoff_max=30
         )
 
     def analyze_document(self, document_url, page_range=None, high_res=False):
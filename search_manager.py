@@ -1,7 +1,8 @@
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from azure.core.credentials import AzureKeyCredential
-from azure.search.documents import SearchClient
+from azure.search.documents import SearchClient, SearchIndexingBufferedSender
 from azure.search.documents.indexes import SearchIndexClient, SearchIndexerClient
 from azure.search.documents.indexes.models import (
     SearchIndex,
@@ -34,17 +35,38 @@ from azure.search.documents.indexes.models import (
 )
 from azure.search.documents.models import VectorizedQuery
 import streamlit as st
+from utils.text_utils import nfc
+import re
+import unicodedata
+
+def odata_prefix_filter(field, prefix):
+    """
+    서버 측 접두사 필터 (filterable 문자열 필드에 대한 범위 비교: prefix <= field < prefix + U+FFFF)
+    인덱서가 저장한 이름은 NFD일 수 있으므로 NFC/NFD 두 형태를 모두 포함
+    """
+    clauses = []
+    for form in dict.fromkeys((unicodedata.normalize('NFC', prefix), unicodedata.normalize('NFD', prefix))):
+        safe = form.replace("'", "''")
+        clauses.append(f"({field} ge '{safe}' and {field} lt '{safe}\uffff')")
+    return " or ".join(clauses)
 
 class AzureSearchManager:
-    def __init__(self, service_endpoint, service_key, index_name="pdf-search-index"):
+    def __init__(self, service_endpoint, service_key, index_name="pdf-search-index", transport=None):
+        """
+        transport: 여러 클라이언트가 공유할 HTTP transport (없으면 클라이언트별 기본 transport)
+        """
         self.service_endpoint = service_endpoint
         self.service_key = service_key
         self.index_name = index_name
         self.credential = AzureKeyCredential(service_key)
         
-        self.index_client = SearchIndexClient(endpoint=service_endpoint, credential=self.credential)
-        self.indexer_client = SearchIndexerClient(endpoint=service_endpoint, credential=self.credential)
-        self.search_client = SearchClient(endpoint=service_endpoint, index_name=index_name, credential=self.credential)
+        client_kwargs = {"transport": transport} if transport is not None else {}
+        self.index_client = SearchIndexClient(endpoint=service_endpoint, credential=self.credential, **client_kwargs)
+        self.indexer_client = SearchIndexerClient(endpoint=service_endpoint, credential=self.credential, **client_kwargs)
+        self.search_client = SearchClient(endpoint=service_endpoint, index_name=index_name, credential=self.credential, **client_kwargs)
+        # 배포된 인덱스의 filename/metadata_storage_name은 facetable이 아님 (기존 필드 속성은 변경 불가, 인덱스 재생성 필요)
+        # 첫 facet 요청이 실패하면 이후에는 바로 문서 조회로 대체
+        self._facets_supported = True
 
     def create_data_source(self, name, connection_string, container_name, query=None, folder_name=None):
         """
@@ -179,6 +201,16 @@ class AzureSearchManager:
         except Exception as e:
             return True, "Indexer did not exist or deleted."
 
+    def skillset_exists(self, skillset_name):
+        """
+        Skillset 존재 여부 확인 (GET 한 번, 없거나 조회 실패 시 False)
+        """
+        try:
+            self.indexer_client.get_skillset(skillset_name)
+            return True
+        except Exception:
+            return False
+
     def create_skillset(self, skillset_name, cognitive_services_key):
         """
         Create a Skillset for OCR (Optical Character Recognition)
@@ -358,24 +390,36 @@ class AzureSearchManager:
         """
         특정 파일의 인덱싱된 내용 조회 (디버깅용)
         """
-        try:
-            # 확장자 체크 및 자동 추가
-            if not filename.lower().endswith('.pdf'):
-                filename += ".pdf"
+        return next(iter(self.get_documents_content([filename]).values()))
 
+    def get_documents_content(self, filenames):
+        """
+        여러 파일의 인덱싱된 내용을 한 번의 검색(search.in 필터)으로 조회 (디버깅용)
+        Returns: {파일명: 내용} (입력 순서 유지, 찾지 못한 파일은 안내 메시지)
+        """
+        # 확장자 체크 및 자동 추가
+        names = [name if name.lower().endswith('.pdf') else name + ".pdf" for name in filenames]
+        try:
             # metadata_storage_name은 SimpleField이므로 search_text가 아닌 filter로 찾아야 함
+            # 파일명에 쉼표가 들어갈 수 있어 구분자는 '|' 사용
+            joined = "|".join(names).replace("'", "''")
             results = self.search_client.search(
                 search_text="*",
-                filter=f"metadata_storage_name eq '{filename}'",
-                select=["metadata_storage_name", "content"]
+                filter=f"search.in(metadata_storage_name, '{joined}', '|')",
+                select=["metadata_storage_name", "content"],
+                top=len(names) * 5  # 같은 이름의 중복 문서 여유분
             )
             
+            found = {}
             for result in results:
-                return result.get("content", "내용 없음")
+                found.setdefault(result["metadata_storage_name"], result.get("content") or "내용 없음")
             
-            return f"문서를 찾을 수 없습니다. (검색된 파일명: {filename})"
+            return {
+                name: found.get(name, f"문서를 찾을 수 없습니다. (검색된 파일명: {name})")
+                for name in names
+            }
         except Exception as e:
-            return f"조회 실패: {str(e)}"
+            return {name: f"조회 실패: {str(e)}" for name in names}
 
     def get_document_count(self):
         """
@@ -387,9 +431,41 @@ class AzureSearchManager:
             print(f"Error getting doc count: {e}")
             return -1
 
-    def search(self, query, filter_expr=None, use_semantic_ranker=False, search_mode="all", **kwargs):
+    def list_indexed_filenames(self, max_files=1000):
+        """
+        인덱스에 등록된 파일명 목록 (서버 측 facet 집계, 문서 본문은 전송하지 않음)
+        도면 페이지 문서는 filename, 그 외 문서는 metadata_storage_name으로 집계
+        facetable 필드가 없는 인덱스(기본 스키마)에서는 문서 이름을 직접 조회하여 추출
+        """
+        if not self._facets_supported:
+            return self._scan_indexed_filenames(max_files)
+        try:
+            results = self.search_client.search(search_text="*", facets=[f"filename,count:{max_files}"], top=0)
+            names = {facet['value'] for facet in results.get_facets().get('filename', [])}
+            results = self.search_client.search(
+                search_text="*",
+                filter="filename eq null",
+                facets=[f"metadata_storage_name,count:{max_files}"],
+                top=0
+            )
+            names.update(facet['value'].split(' (p.')[0] for facet in results.get_facets().get('metadata_storage_name', []))
+            return sorted(names)
+        except Exception as e:
+            print(f"Facet listing unavailable ({e}); falling back to document scan")
+            self._facets_supported = False
+            return self._scan_indexed_filenames(max_files)
+
+    def _scan_indexed_filenames(self, max_files):
+        """
+        문서 이름만 조회하여 파일명 목록 추출 (facet 미지원 인덱스용)
+        """
+        results = self.search_client.search(search_text="*", select=["metadata_storage_name"], top=max_files)
+        return sorted({doc['metadata_storage_name'].split(' (p.')[0] for doc in results})
+
+    def search(self, query, filter_expr=None, use_semantic_ranker=False, search_mode="all", highlight=True, **kwargs):
         """
         문서 검색
+        highlight: False면 하이라이트 스니펫을 요청하지 않음 (화면에 표시하지 않는 호출용)
         """
         try:
             # Force AND logic if search_mode is 'all'
@@ -416,6 +492,10 @@ class AzureSearchManager:
                 "search_mode": search_mode
             }
             
+            if not highlight:
+                for key in ("highlight_fields", "highlight_pre_tag", "highlight_post_tag"):
+                    del search_params[key]
+            
             # Update with any additional parameters (e.g. select, top)
             search_params.update(kwargs)
 
@@ -454,6 +534,62 @@ class AzureSearchManager:
         except Exception as e:
             return False, f"Upload failed: {str(e)}"
 
+    def upload_documents_buffered(self, documents, initial_batch_action_count=1000):
+        """
+        대량 문서 업로드 (SearchIndexingBufferedSender)
+        SDK가 배치 구성, 스로틀링(503) 재시도, 요청 크기 초과 시 배치 분할을 처리
+        """
+        failed_docs = []
+        
+        def on_error(action):
+            doc_id = getattr(action, "additional_properties", {}).get("id")
+            failed_docs.append(f"Key: {doc_id}")
+        
+        try:
+            with SearchIndexingBufferedSender(
+                endpoint=self.service_endpoint,
+                index_name=self.index_name,
+                credential=self.credential,
+                auto_flush_interval=1,
+                initial_batch_action_count=initial_batch_action_count,
+                on_error=on_error
+            ) as sender:
+                sender.upload_documents(documents=documents)
+        except Exception as e:
+            return False, f"Upload failed: {str(e)}"
+        
+        if failed_docs:
+            return False, f"Partial upload failure: {'; '.join(failed_docs)}"
+        
+        return True, f"Successfully uploaded {len(documents)} documents."
+
+    def index_in_batches(self, action, documents, batch_size=1000, max_workers=4):
+        """
+        documents를 batch_size(인덱스 요청당 최대 1000건) 단위로 나눠 병렬 전송
+        action: SearchClient 메서드 이름 ('delete_documents', 'merge_documents' 등)
+        """
+        send = getattr(self.search_client, action)
+        batches = [documents[i:i + batch_size] for i in range(0, len(documents), batch_size)]
+        if len(batches) <= 1:
+            return [result for batch in batches for result in send(documents=batch)]
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+            return [result for batch_results in executor.map(lambda batch: send(documents=batch), batches) for result in batch_results]
+
+    def collect_document_ids(self, filter_expr, max_documents=100000):
+        """
+        필터에 맞는 문서의 id만 조회
+        단일 커서로 순차 조회 (병렬 $skip 페이지는 정렬 키 없이 경계가 흔들려 id가 누락/중복될 수 있음)
+        서비스의 $skip 상한 때문에 한 번에 최대 100,000건 - 그 이상은 처리(삭제) 후 다시 호출
+        """
+        results = self.search_client.search(
+            search_text="*",
+            filter=filter_expr,
+            select=["id"],
+            top=max_documents  # 서비스가 1000건 단위로 나눠 반환하고 SDK가 다음 페이지를 이어서 요청
+        )
+        return [doc['id'] for doc in results]
+
     def get_document_json(self, filename):
         """
         특정 파일의 모든 페이지/청크를 JSON 형태로 가져오기
@@ -506,7 +642,7 @@ class AzureSearchManager:
                     top=1000
                 )
                 for doc in results:
-                    doc_name = unicodedata.normalize('NFC', doc.get('metadata_storage_name', ''))
+                    doc_name = nfc(doc.get('metadata_storage_name', ''))
                     if filename in doc_name:
                         documents.append(doc)
             
@@ -520,6 +656,41 @@ class AzureSearchManager:
             print(f"Error fetching document JSON: {e}")
             return []
 
+    def find_drawing_pages(self, filename, select=None):
+        """
+        도면 분석 문서(project='drawings_analysis') 중 특정 파일의 모든 페이지를 서버 측 필터로 조회
+        filename 필드가 없는 이전 문서(이름 변경 등)는 metadata_storage_name 구문 검색으로 보완
+        """
+        filename = unicodedata.normalize('NFC', filename)
+        safe_filename_odata = filename.replace("'", "''")
+        escaped_filename_search = re.sub(r'([+\-&|!(){}\[\]^"~*?:\\])', r'\\\1', filename)
+        
+        # 1. Exact match on the filterable filename field
+        documents = {}
+        results = self.search_client.search(
+            search_text="*",
+            filter=f"project eq 'drawings_analysis' and filename eq '{safe_filename_odata}'",
+            select=select
+        )
+        for doc in results:
+            documents[doc['id']] = doc
+        
+        # 2. Legacy docs without filename: phrase search on the name, verify the "{filename} (p.N)" prefix
+        # (the prefix check needs metadata_storage_name whatever the caller selected)
+        legacy_select = list(dict.fromkeys([*select, "metadata_storage_name"])) if select else None
+        results = self.search_client.search(
+            search_text=f"\"{escaped_filename_search}\"",
+            search_fields=["metadata_storage_name"],
+            filter="project eq 'drawings_analysis' and filename eq null",
+            select=legacy_select
+        )
+        for doc in results:
+            doc_name = nfc(doc.get('metadata_storage_name', ''))
+            if doc_name.startswith(filename):
+                documents[doc['id']] = doc
+        
+        return list(documents.values())
+
     def upload_analysis_json(self, container_client, user_folder, filename, page_chunks):
         """
         Document Intelligence 분석 결과를 Blob Storage에 JSON으로 저장
@@ -0,0 +1,7 @@
+import unicodedata
+from functools import lru_cache
+
+@lru_cache(maxsize=4096)
+def nfc(text):
+    """NFC-normalize a filename/document name (memoized: the same names are compared repeatedly)."""
+    return unicodedata.normalize('NFC', text)